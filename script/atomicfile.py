@@ -0,0 +1,61 @@
+"""Output files, which are written to a temporary file and renamed to their name on success"""
+
+__all__ = ("AtomicFile", "write")
+
+import os
+import tempfile
+
+# Temporary files are created with mode 0600, renamed files get the mode of a normal open()
+umask = os.umask(0)
+os.umask(umask)
+
+class AtomicFile(object):
+    """File written to a temporary file in the directory of name.
+
+    close() renames the temporary file to name, so readers never see a
+    partially written file and concurrent writers of the same name do
+    not interleave. discard() removes the temporary file and keeps a
+    previous file of name unchanged. Used in a with statement, the file
+    is closed on success and discarded on exception.
+
+    """
+
+    def __init__(self, name, mode = "w"):
+        self.name = name
+        directory, base = os.path.split(os.path.abspath(name))
+        handle, self.temp = tempfile.mkstemp(prefix = "." + base + ".", suffix = ".tmp", dir = directory)
+        self.file = os.fdopen(handle, mode)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self.file.close()
+            os.chmod(self.temp, 0666 & ~umask)
+            os.rename(self.temp, self.name)
+        except:
+            self.discard()
+            raise
+
+    def discard(self):
+        self.file.close()
+        if os.path.isfile(self.temp):
+            os.remove(self.temp)
+
+def write(name, data, mode = "w"):
+    """Write data to file name atomically"""
+    with AtomicFile(name, mode) as file:
+        file.write(data)
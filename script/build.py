@@ -0,0 +1,117 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Build all symbol libraries, footprints, projects and the summary in one process.
+# Configuration and template caches are shared between all targets.
+
+import os
+import sys
+import argparse
+import traceback
+import device
+import footprint
+import project
+import summary
+import readme
+import config
+from devgen import resistor
+import landpattern
+
+LIBRARY_ROOT = "library"
+FOOTPRINT_ROOT = "modules"
+PACKAGE_ROOT = "packages"
+CSV_ROOT = "data/device"
+FOOTPRINT_CSV_ROOT = "data/footprint"
+LANDPATTERN_CSV_ROOT = "data/landpattern"
+TEMPLATE_ROOT = "data/template"
+TABLE_ROOT = "data/symbol"
+PROJECT_TEMPLATE = "data/project.pro"
+
+# Target lists are shared with the Makefile
+TARGETS_FILE = "targets"
+targets = config.load(TARGETS_FILE)
+
+# Template/table based symbols
+SYMBOL_LIBRARIES = str(targets.TARGET_LIBRARIES).split()
+
+# Footprints
+FOOTPRINTS = str(targets.TARGET_FOOTPRINTS).split()
+
+# Project files/templates
+PROJECTS = str(targets.TARGET_PROJECTS).split()
+
+# Generated device table, rebuilt like make does, if it is older than its generator or the target lists
+RESISTOR_TABLE = os.path.join(CSV_ROOT, "resistor.csv")
+RESISTOR_SCRIPT = "script/devgen/resistor.py"
+LANDPATTERN_SCRIPT = "script/landpattern.py"
+
+# Suffix of footprint families calculated from land pattern tables, e.g. soic_ipc from data/landpattern/soic.csv
+LANDPATTERN_SUFFIX = "_ipc"
+
+def outdated(target, dependencies):
+    """True if target is missing or older than one of its dependencies"""
+    if not os.path.isfile(target):
+        return True
+    return os.path.getmtime(target) < max([os.path.getmtime(dependency) for dependency in dependencies])
+
+def build(libraries = SYMBOL_LIBRARIES, footprints = FOOTPRINTS, projects = PROJECTS, summary_file = "summary.txt", readme_file = "README.md", jobs = 1, footprint_cache = None):
+    """Build the given targets. Library and footprint names are given without path and extension."""
+    if "resistor" in libraries and outdated(RESISTOR_TABLE, [RESISTOR_SCRIPT, TARGETS_FILE]):
+        resistor.generate([int(erow) for erow in str(targets.RESISTOR_TABLE_EROW).split()], str(targets.RESISTOR_TABLE_FOOTPRINTS).split(), RESISTOR_TABLE)
+
+    for name in footprints:
+        if name.endswith(LANDPATTERN_SUFFIX):
+            table = os.path.join(LANDPATTERN_CSV_ROOT, name[:-len(LANDPATTERN_SUFFIX)] + ".csv")
+            output = os.path.join(FOOTPRINT_CSV_ROOT, name + ".csv")
+            if outdated(output, [table, LANDPATTERN_SCRIPT, "config"]):
+                landpattern.calculate(table, output)
+
+    for name in footprints:
+        output_path = os.path.join(FOOTPRINT_ROOT, name)
+        if not os.path.isdir(output_path):
+            os.makedirs(output_path)
+    footprint.generate([os.path.join(FOOTPRINT_CSV_ROOT, name + ".csv") for name in footprints], PACKAGE_ROOT, [os.path.join(FOOTPRINT_ROOT, name) for name in footprints], jobs, True, footprint_cache)
+
+    for name in libraries:
+        base = os.path.join(LIBRARY_ROOT, name)
+        device.generate(os.path.join(CSV_ROOT, name + ".csv"), base + ".lib", base + ".dcm", TEMPLATE_ROOT, TABLE_ROOT, jobs, base + ".manifest")
+
+    for name in projects:
+        project.generate(PROJECT_TEMPLATE, name, LIBRARY_ROOT, FOOTPRINT_ROOT)
+
+    if summary_file:
+        summary.generate([os.path.join(LIBRARY_ROOT, name + ".lib") for name in libraries], [os.path.join(FOOTPRINT_ROOT, name) for name in footprints], summary_file)
+
+    if readme_file:
+        readme.generate(readme_file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Build all libraries, footprints and projects in one process.')
+    parser.add_argument('--libs', nargs = '*', metavar = 'libs', type = str, help = 'Symbol libraries to build (default: all)', default = SYMBOL_LIBRARIES)
+    parser.add_argument('--footprints', nargs = '*', metavar = 'footprints', type = str, help = 'Footprint families to build (default: all)', default = FOOTPRINTS)
+    parser.add_argument('--projects', nargs = '*', metavar = 'projects', type = str, help = 'Project files to build (default: all)', default = PROJECTS)
+    parser.add_argument('--summary', type = str, help = 'Summary output file', default = "summary.txt")
+    parser.add_argument('--readme', type = str, help = 'Readme output file', default = "README.md")
+    parser.add_argument('--jobs', type = int, help = 'Number of worker processes used to build symbols and footprints', default = 1)
+    parser.add_argument('--footprint_cache', type = str, help = 'Cache directory for generated footprints')
+    args = parser.parse_args()
+
+    try:
+        build(args.libs, args.footprints, args.projects, args.summary, args.readme, args.jobs, args.footprint_cache)
+    except Exception as e:
+        traceback.print_exc()
+        sys.exit(2)
@@ -31,6 +31,7 @@
 
 
 import csv
+import atomicfile
 from math import log,floor,pow
 #import itertools
 
@@ -251,16 +252,16 @@ if __name__ == "__main__":
     parser.add_argument('--output', metavar='out', type=str,
             help='the flat condensator table file', required=True)
     args = parser.parse_args()
-    output = open(args.output, "w")
-    # write the header
-    output.write("symbol,name,reference,footprint,description,keywords,1,2,value,tolerance,voltage,alias\n")
-    generator = CapacitorTableGenerator()
-    if args.murata != None:
-        for src in args.murata:
-            generator.MakeMurataGRMSerieSet(src)
+    with atomicfile.AtomicFile(args.output) as output:
+        # write the header
+        output.write("symbol,name,reference,footprint,description,keywords,1,2,value,tolerance,voltage,alias\n")
+        generator = CapacitorTableGenerator()
+        if args.murata != None:
+            for src in args.murata:
+                generator.MakeMurataGRMSerieSet(src)
 
-    if args.avx != None:
-        for src in args.avx:
-            generator.MakeAVXCondensatorSet(src)
+        if args.avx != None:
+            for src in args.avx:
+                generator.MakeAVXCondensatorSet(src)
 
-    generator.WriteResult(output)
+        generator.WriteResult(output)
@@ -1,6 +1,6 @@
 """Configuration parsing module, which generate a python namespace"""
 
-__all__ = ("Config")
+__all__ = ("Config", "load")
 
 from collections import Mapping, Sequence
 
@@ -39,3 +39,12 @@ class Config(object):
 
     def dict(self):
         return self.__dict__
+
+# Parsed configuration files, shared by all modules of one process
+configs = {}
+
+def load(configFile):
+    """Return the configuration of configFile, it is parsed only once per process"""
+    if configFile not in configs:
+        configs[configFile] = Config(configFile)
+    return configs[configFile]
@@ -1,10 +1,15 @@
 #!/usr/bin/python
 
+import os
 import sys
 import math
 import itertools
 import argparse
 
+# Shared modules of the generator scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import atomicfile
+
 DECADE_START = 0
 DECADE_END   = 8
 
@@ -55,27 +60,21 @@ def resistor(erow, index, decade):
     result = parts[0]+char[decade]+parts[1]
     return result
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description = 'Resistor table generator')
-    parser.add_argument('--erow', type = int, nargs = "+", help = 'E-Row to generate (3, 6, 12, 24, 48, 96, 192)', required = True)
-    parser.add_argument('--footprint', type = str, nargs = "+", help = 'Footprint (chip_resistor_0201, chip_resistor_0402, chip_resistor_0603, chip_resistor_0805, chip_resistor_1206, chip_resistor_1210, wire_10mm, melf, melf_mini, melf_micro)', required = True)
-    parser.add_argument('--output_file', type = str, help = 'Output file for generated table', required = True)
-    args = parser.parse_args()
+def generate(erows, footprints, output_file):
+    """Write resistor table of all values of the E-rows erows in all footprints to output_file"""
+    for footprint in footprints:
+        if not footprint in footprint_data:
+            raise Exception("FOOTPRINT value '%s' is invalid!"%(footprint))
+    for erow in erows:
+        if not erow in erow_data:
+            raise Exception("EROW value '%s' is invalid!"%(erow))
 
-    with open(args.output_file, 'w') as outfile:
+    with atomicfile.AtomicFile(output_file) as outfile:
         line = ["symbol", "name", "reference", "footprint", "description", "keywords", "1", "2", "value", "tolerance", "power"]
         outfile.write(','.join(line)+'\n')
 
-        for footprint in args.footprint:
-            if not footprint in footprint_data:
-                print "FOOTPRINT value '%s' is invalid!"%(footprint)
-                sys.exit(2)
-
-            for erow in args.erow:
-                if not erow in erow_data:
-                    print "EROW value '%s' is invalid!"%(erow)
-                    sys.exit(2)
-
+        for footprint in footprints:
+            for erow in erows:
                 for decade in range(DECADE_START, DECADE_END):
                     for index in range(0, erow):
                         value = resistor(erow, index, decade)
@@ -91,4 +90,16 @@ if __name__ == "__main__":
 
                         if index == 0 and decade == DECADE_END - 1:
                             break
-        outfile.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Resistor table generator')
+    parser.add_argument('--erow', type = int, nargs = "+", help = 'E-Row to generate (3, 6, 12, 24, 48, 96, 192)', required = True)
+    parser.add_argument('--footprint', type = str, nargs = "+", help = 'Footprint (chip_resistor_0201, chip_resistor_0402, chip_resistor_0603, chip_resistor_0805, chip_resistor_1206, chip_resistor_1210, wire_10mm, melf, melf_mini, melf_micro)', required = True)
+    parser.add_argument('--output_file', type = str, help = 'Output file for generated table', required = True)
+    args = parser.parse_args()
+
+    try:
+        generate(args.erow, args.footprint, args.output_file)
+    except Exception as e:
+        print e
+        sys.exit(2)
@@ -3,130 +3,458 @@
 import os
 import sys
 import symbol
+import fsindex
+import atomicfile
+import summary
 from symbol import cfg
 import csv
 import argparse
 import traceback
+import StringIO
+import multiprocessing
+import hashlib
+import json
+import re
+import math
 
-if __name__ == "__main__":
+SYMBOL_HEADER = "EESchema-LIBRARY Version 2.3\n#encoding utf-8\n"
+SYMBOL_FOOTER = "#\n# End Library\n"
+DESC_HEADER = "EESchema-DOCLIB Version 2.0\n"
+DESC_FOOTER = "#\n# End Doc Library\n"
+
+symbolBlockRe = re.compile(r'^#\n# .*?^ENDDEF\n', re.M | re.S)
+valueRe = re.compile(r'^(\d+)(?:[.,](\d+))?([pnumRrKkMG]?)(\d*)')
+shardNameRe = re.compile(r'[^A-Za-z0-9.+-]')
+
+SHARD_MODES = ["footprint", "decade", "series"]
+valueMultipliers = {'p': 1e-12, 'n': 1e-9, 'u': 1e-6, 'm': 1e-3, '': 1.0, 'R': 1.0, 'r': 1.0, 'K': 1e3, 'k': 1e3, 'M': 1e6, 'G': 1e9}
+
+def readGroups(filename):
+    """Read CSV table and split it into groups of consecutive rows sharing the same name"""
+    groups = []
+    with open(filename, 'rb') as csvfile:
+        table = csv.reader(csvfile, delimiter=',', quotechar='\"')
+
+        last_name = ""
+        first_row = 1
+        for row in table:
+            if first_row == 1:
+                header = row
+                first_row = 0
+            else:
+                data = dict(zip(header, row))
+                # Check data for every line
+                if 'symbol' not in data or 'name' not in data:
+                    raise Exception("Missing one or more of the required fields 'symbol' and 'name' in CSV data")
+
+                if last_name != data['name']:
+                    groups.append([])
+                    last_name = data['name']
+                groups[-1].append(data)
+    return groups
+
+def buildSymbol(rows, template_path, table_path, document_prefix):
+    """Build and optimize one symbol from its CSV rows"""
+    for data in rows:
+        # Create file strings
+        template_file = os.path.join(template_path, data['symbol'] + cfg.SYMBOL_TEMPLATE_EXTENSION)
+        table_file = os.path.join(table_path, data['symbol'] + cfg.SYMBOL_TABLE_EXTENSION)
+
+        if data is rows[0]:
+            # Simple error checking
+            if 'reference' not in data:
+                raise Exception("Missing the required field 'reference' in CSV data")
+
+            # Check optional fields
+            if 'footprint' not in data:
+                data['footprint'] = ''
+
+            if 'alias' not in data:
+                data['alias'] = ''
+
+            if 'description' not in data:
+                data['description'] = ''
+
+            if 'keywords' not in data:
+                data['keywords'] = ''
+
+            if 'document' not in data:
+                data['document'] = ''
+            elif len(data['document']) > 0:
+                # Bare file names are documents in the document root
+                if not os.path.dirname(data['document']):
+                    data['document'] = os.path.join(cfg.SYMBOL_DOCUMENT_ROOT, data['document'])
+                if fsindex.isfile(data['document']):
+                    data['document'] = os.path.join(document_prefix, data['document'])
+                else:
+                    print "Warning: '"+data['document']+"' not found"
+                    data['document'] = ''
+
+            if 'section' not in data:
+                data['section'] = ''
+
+            firstElement = True
+            sym = symbol.Symbol(data['name'], data['reference'], data['footprint'], data['alias'], data['description'], data['keywords'], data['document'])
+
+        if 'unit' not in data:
+            data['unit'] = "0"
+
+        unit = int(data['unit'])
+        if fsindex.isfile(template_file):
+            sym.load(template_file, unit, symbol.representation.normal, data, firstElement)
+        elif fsindex.isfile(table_file):
+            sym.fromCSV(table_file, unit, data['section'], unit != 0)
+            #if not unit and 'value' in data:
+            #   sym.addModule(symbol.Text(0, 0, data['value'], cfg.SYMBOL_TEXT_SIZE))
+
+        #elif os.path.isfile(port_table_file):
+        #   sym.fromCSV(port_table_file, int(data['unit']), cfg.SYMBOL_PIN_TEXT_OFFSET, False)
+        else:
+            raise Exception("Template file '%s' or table file '%s' does not exist!"%(template_file, table_file))
+
+        # As many symbols can contain field elements, we load them only from the first symbol
+        if firstElement:
+            if not sym.setFields(data):
+            #   print "Error in ", template_file
+                raise Exception("Error setting fields %s"%(template_file))
+            #sym.setDescriptions(data)
+            firstElement = False
+
+    sym.optimize()
+    return sym
+
+def buildJob(job):
+    """Pool entry point, builds the symbol and returns the rendered symbol and description text"""
+    sym = buildSymbol(*job)
+    symbol_buffer = StringIO.StringIO()
+    sym.writeSymbol(symbol_buffer)
+    desc_buffer = StringIO.StringIO()
+    sym.writeDescription(desc_buffer)
+    return (symbol_buffer.getvalue(), desc_buffer.getvalue())
+
+def scriptVersion():
+    """Hash of the generator sources and configuration, a change invalidates all symbols of a manifest"""
+    md5 = hashlib.md5()
+    for filename in [__file__, symbol.__file__, "config"]:
+        if filename.endswith(".pyc"):
+            filename = filename[:-1]
+        with open(filename, "rb") as file:
+            md5.update(file.read())
+    return md5.hexdigest()
+
+def jobKey(job):
+    """Hash of the CSV rows and paths used to build one symbol"""
+    return hashlib.md5(json.dumps(job, sort_keys = True)).hexdigest()
+
+def dependencies(job, stamps):
+    """Modification time of every template, table and document file a symbol may use (None if missing).
+        stamps caches results, as most symbols share the same files.
+    """
+    rows, template_path, table_path, document_prefix = job
+    files = []
+    for data in rows:
+        files.append(os.path.join(template_path, data['symbol'] + cfg.SYMBOL_TEMPLATE_EXTENSION))
+        files.append(os.path.join(table_path, data['symbol'] + cfg.SYMBOL_TABLE_EXTENSION))
+    if len(rows[0].get('document', '')):
+        files.append(rows[0]['document'])
+
+    result = {}
+    for filename in files:
+        if filename not in stamps:
+            stamps[filename] = os.path.getmtime(filename) if fsindex.isfile(filename) else None
+        result[filename] = stamps[filename]
+    return result
+
+def loadManifest(manifest, symbol_file, desc_file, version):
+    """Load rendered symbols of the previous build. Returns a dict of job key -> (dependencies, symbol text, description text)"""
+    if not os.path.isfile(manifest) or not os.path.isfile(symbol_file) or not os.path.isfile(desc_file):
+        return {}
+
+    with open(manifest, "r") as file:
+        data = json.load(file)
+    if data['version'] != version:
+        return {}
+
+    with open(symbol_file, "r") as file:
+        symbol_data = file.read()
+    with open(desc_file, "r") as file:
+        desc_data = file.read()
+
+    # Outputs have been changed outside of this script, so nothing can be reused
+    if len(symbol_data) != len(SYMBOL_HEADER) + sum(entry['symbol'] for entry in data['symbols']) + len(SYMBOL_FOOTER):
+        return {}
+    if len(desc_data) != len(DESC_HEADER) + sum(entry['description'] for entry in data['symbols']) + len(DESC_FOOTER):
+        return {}
+
+    result = {}
+    symbol_offset = len(SYMBOL_HEADER)
+    desc_offset = len(DESC_HEADER)
+    for entry in data['symbols']:
+        result[entry['key']] = (entry['depends'], symbol_data[symbol_offset:symbol_offset + entry['symbol']], desc_data[desc_offset:desc_offset + entry['description']])
+        symbol_offset += entry['symbol']
+        desc_offset += entry['description']
+    return result
+
+def compactSymbols(text):
+    """Merge rendered symbols, which only differ in their name, into the first of them as aliases.
+        The name field is only ignored, if it is equal to the symbol name, as aliases take their name as value.
+    """
+    nameField = 'F%d "%%s" '%(cfg.NAME_FIELD)
+    order = []
+    symbols = {}
+    for block in symbolBlockRe.findall(text):
+        lines = block.split("\n")
+        name = lines[3].split(" ")[1]
+        aliases = []
+        key = [lines[3].replace(" "+name+" ", " ", 1)]
+        for line in lines[4:]:
+            if line.startswith("ALIAS "):
+                aliases = line.split()[1:]
+            else:
+                key.append(line.replace(nameField%(name), nameField%(""), 1))
+        key = "\n".join(key)
+
+        if key in symbols:
+            symbols[key][1].extend([name] + aliases)
+        else:
+            symbols[key] = (lines, aliases)
+            order.append(key)
+
+    result = []
+    for key in order:
+        lines, aliases = symbols[key]
+        lines = [line for line in lines if not line.startswith("ALIAS ")]
+        if len(aliases):
+            lines.insert(lines.index("DRAW"), "ALIAS "+" ".join(aliases))
+        result.append("\n".join(lines))
+    return "".join(result)
+
+def decade(value):
+    """Decade of a component value like 4K7, 1R0 or 100n as '1e<exponent>', None if value is not numeric"""
+    match = valueRe.match(value)
+    if not match:
+        return None
+    number = float(match.group(1) + "." + (match.group(2) or match.group(4) or "0")) * valueMultipliers[match.group(3)]
+    if number <= 0:
+        return None
+    return "1e%d"%(int(math.floor(math.log10(number) + 1e-9)))
+
+def shardKey(rows, mode):
+    """Shard name of a symbol built from rows.
+        footprint - Footprint of the symbol
+        decade - Decade of the value column
+        series - Series column, else tolerance (E-series of generated passives), else manufacturer
+    """
+    data = rows[0]
+    key = None
+    if mode == "footprint":
+        key = data.get('footprint')
+    elif mode == "decade":
+        key = decade(data.get('value', ''))
+    elif mode == "series":
+        for field in ['series', 'tolerance', 'manufacturer']:
+            if data.get(field):
+                key = data[field]
+                break
+    else:
+        raise Exception("Unknown shard mode '%s'"%(mode))
+    return shardNameRe.sub("_", key.replace("%", "pct")) if key else "other"
+
+def writeShards(shard_path, symbol_jobs, entries, symbol_file, desc_file, mode = None, size = 0):
+    """Split a generated library into shard libraries in shard_path, by mode and/or a maximum size in bytes.
+        entries are the symbol and description lengths of every job in order of the library.
+        Shards of a previous build, which are not generated again, are removed.
+    """
+    with open(symbol_file, "r") as file:
+        symbol_data = file.read()
+    with open(desc_file, "r") as file:
+        desc_data = file.read()
+
+    # Symbols of each key in library order
+    order = []
+    shards = {}
+    symbol_offset = len(SYMBOL_HEADER)
+    desc_offset = len(DESC_HEADER)
+    for job, entry in zip(symbol_jobs, entries):
+        key = shardKey(job[0], mode) if mode else ""
+        if key not in shards:
+            shards[key] = []
+            order.append(key)
+        shards[key].append((symbol_data[symbol_offset:symbol_offset + entry['symbol']], desc_data[desc_offset:desc_offset + entry['description']]))
+        symbol_offset += entry['symbol']
+        desc_offset += entry['description']
+
+    # Split shards exceeding the size budget, a single symbol above it gets its own shard
+    names = []
+    blocks = []
+    for key in order:
+        parts = [[]]
+        length = len(SYMBOL_HEADER) + len(SYMBOL_FOOTER)
+        for block in shards[key]:
+            if size and len(parts[-1]) and length + len(block[0]) > size:
+                parts.append([])
+                length = len(SYMBOL_HEADER) + len(SYMBOL_FOOTER)
+            parts[-1].append(block)
+            length += len(block[0])
+
+        for i, part in enumerate(parts):
+            if not key:
+                names.append("%03d"%(i + 1))
+            elif len(parts) > 1:
+                names.append("%s_%d"%(key, i + 1))
+            else:
+                names.append(key)
+            blocks.append(part)
+
+    if not os.path.isdir(shard_path):
+        os.makedirs(shard_path)
+    for file in os.listdir(shard_path):
+        name, extension = os.path.splitext(file)
+        if extension in (".lib", ".dcm") and name not in names:
+            os.remove(os.path.join(shard_path, file))
+
+    for name, part in zip(names, blocks):
+        with atomicfile.AtomicFile(os.path.join(shard_path, name + ".lib")) as file:
+            file.write(SYMBOL_HEADER)
+            file.write("".join([block[0] for block in part]))
+            file.write(SYMBOL_FOOTER)
+        with atomicfile.AtomicFile(os.path.join(shard_path, name + ".dcm")) as file:
+            file.write(DESC_HEADER)
+            file.write("".join([block[1] for block in part]))
+            file.write(DESC_FOOTER)
+    return names
+
+def generate(csv_file, symbol_file, desc_file, template_path, table_path, jobs = 1, manifest = None, compact = False, shard = None, shard_size = 0, sort = False):
+    """Generate symbol library and description file from csv table. Outputs are written to temporary files,
+        which are renamed on success. On error previous outputs are kept unchanged.
+        compact - Merge symbols only differing in name to one symbol with aliases. Manifest is not used and removed.
+        shard, shard_size - Additionally split the library by shard mode (see shardKey) and/or a maximum size
+            in bytes into libraries in a directory next to the library, named like the library.
+        sort - Write symbols in natural order of their names instead of csv order, as libmerge.py expects
+    """
+    symbol_output = None
+    library_output = None
+    desc_output = None
+    # Manifest of a previous build, which does not describe the new outputs
+    stale_manifest = None
+    pool = None
     try:
-        parser = argparse.ArgumentParser(description = 'Symbol generator from csv table.')
-        parser.add_argument('--csv', type = str, help = 'CSV formatted input table', required = True)
-        parser.add_argument('--symbol', type = str, help = 'Output file for generated KiCAD symbols', required = True)
-        parser.add_argument('--desc', type = str, help = 'Output file for generated KiCAD symbol description', required = True)
-        parser.add_argument('--template_path', type = str, help = 'Path to template symbols', required = True)
-        parser.add_argument('--table_path', type = str, help = 'Path to table based symbols', required = True)
-        args = parser.parse_args()
+        if compact:
+            if shard or shard_size:
+                raise Exception("Compact libraries can not be sharded")
+            stale_manifest = manifest
+            manifest = None
 
         # KiCAD uses user home as source for documents
         document_prefix = os.path.relpath(os.getcwd(), os.path.expanduser("~"))
 
-        symbol_output = open(args.symbol, "w")
-        symbol_output.write("EESchema-LIBRARY Version 2.3\n#encoding utf-8\n")
-        desc_output = open(args.desc, "w")
-        desc_output.write('EESchema-DOCLIB Version 2.0\n')
+        template_path = os.path.normpath(template_path)
+        table_path = os.path.normpath(table_path)
 
-        args.template_path = os.path.normpath(args.template_path)
-        args.table_path = os.path.normpath(args.table_path)
+        # List template and table directories before worker processes are forked, indexes of a previous run
+        # in this process are listed again if files were added or removed since
+        fsindex.refresh()
+        # Templates and tables are checked for modification once per run, not once per CSV row
+        symbol.resetStamps()
+        fsindex.load(template_path)
+        fsindex.load(table_path)
 
-        with open(args.csv, 'rb') as csvfile:
-            table = csv.reader(csvfile, delimiter=',', quotechar='\"')
+        symbol_jobs = [(rows, template_path, table_path, document_prefix) for rows in readGroups(csv_file)]
+        if sort:
+            symbol_jobs.sort(key = lambda job: summary.natural_key(job[0][0]['name']))
 
-            last_name = ""
-            first_row = 1
-            for row in table:
-                if first_row == 1:
-                    header = row
-                    first_row = 0
-                else:
-                    data = dict(zip(header, row))
-                    # Check data for every line
-                    if 'symbol' not in data or 'name' not in data:
-                        raise Exception("Missing one or more of the required fields 'symbol' and 'name' in CSV data")
-
-                    # Create file strings
-                    template_file = os.path.join(args.template_path, data['symbol'] + cfg.SYMBOL_TEMPLATE_EXTENSION)
-                    table_file = os.path.join(args.table_path, data['symbol'] + cfg.SYMBOL_TABLE_EXTENSION)
-
-                    # Name changed, we have to save symbol and create a new one
-                    if last_name != data['name']:
-                        if 'sym' in locals():
-                            sym.optimize()
-                            symbol_output.write("\n".join(sym.renderSymbol()))
-                            desc_output.write("\n".join(sym.renderDescription()))
-                            del sym
-
-                        # Simple error checking
-                        if 'reference' not in data:
-                            raise Exception("Missing the required field 'reference' in CSV data")
-
-                        # Check optional fields
-                        if 'footprint' not in data:
-                            data['footprint'] = ''
-
-                        if 'alias' not in data:
-                            data['alias'] = ''
-
-                        if 'description' not in data:
-                            data['description'] = ''
-
-                        if 'keywords' not in data:
-                            data['keywords'] = ''
-
-                        if 'document' not in data:
-                            data['document'] = ''
-                        elif len(data['document']) > 0:
-                            if os.path.isfile(data['document']):
-                                data['document'] = os.path.join(document_prefix, data['document'])
-                            else:
-                                print "Warning: '"+data['document']+"' not found"
-                                data['document'] = ''
-
-                        if 'section' not in data:
-                            data['section'] = ''
-
-                        firstElement = True
-                        sym = symbol.Symbol(data['name'], data['reference'], data['footprint'], data['alias'], data['description'], data['keywords'], data['document'])
-                        last_name = data['name']
-
-                    if 'unit' not in data:
-                        data['unit'] = "0"
-
-                    unit = int(data['unit'])
-                    if os.path.isfile(template_file):
-                        sym.load(template_file, unit, symbol.representation.normal, data, firstElement)
-                    elif os.path.isfile(table_file):
-                        sym.fromCSV(table_file, unit, data['section'], unit != 0)
-                        #if not unit and 'value' in data:
-                        #   sym.addModule(symbol.Text(0, 0, data['value'], cfg.SYMBOL_TEXT_SIZE))
-
-                    #elif os.path.isfile(port_table_file):
-                    #   sym.fromCSV(port_table_file, int(data['unit']), cfg.SYMBOL_PIN_TEXT_OFFSET, False)
-                    else:
-                        raise Exception("Template file '%s' or table file '%s' does not exist!"%(template_file, table_file))
-
-                    # As many symbols can contain field elements, we load them only from the first symbol
-                    if firstElement:
-                        if not sym.setFields(data):
-                        #   print "Error in ", template_file
-                            raise Exception("Error setting fields %s"%(template_file))
-                        #sym.setDescriptions(data)
-                        firstElement = False
-
-        if 'sym' in locals():
-            sym.optimize()
-            symbol_output.write("\n".join(sym.renderSymbol()))
-            desc_output.write("\n".join(sym.renderDescription()))
-            del sym
-        symbol_output.write("#\n# End Library\n")
-        desc_output.write("#\n# End Doc Library\n")
+        # Symbols are reused, if CSV rows and all used files are unchanged
+        keys = [jobKey(job) for job in symbol_jobs]
+        stamps = {}
+        depends = [dependencies(job, stamps) for job in symbol_jobs]
+        previous = {}
+        if manifest:
+            version = scriptVersion()
+            previous = loadManifest(manifest, symbol_file, desc_file, version)
+        reuse = [previous[key] if key in previous and previous[key][0] == depend else None for key, depend in zip(keys, depends)]
+
+        symbol_output = atomicfile.AtomicFile(symbol_file)
+        symbol_output.write(SYMBOL_HEADER)
+        if compact:
+            library_output = symbol_output
+            symbol_output = StringIO.StringIO()
+        desc_output = atomicfile.AtomicFile(desc_file)
+        desc_output.write(DESC_HEADER)
+
+        stale = [job for job, cached in zip(symbol_jobs, reuse) if cached is None]
+        if jobs > 1 and len(stale):
+            pool = multiprocessing.Pool(jobs)
+            # imap keeps the order of the input groups, so output is equal to a serial run
+            built = pool.imap(buildJob, stale, max(1, len(stale) / (jobs * 4)))
+
+        entries = []
+        for job, key, depend, cached in zip(symbol_jobs, keys, depends, reuse):
+            symbol_start = symbol_output.tell()
+            desc_start = desc_output.tell()
+            if cached is not None:
+                symbol_output.write(cached[1])
+                desc_output.write(cached[2])
+            elif pool:
+                symbol_text, desc_text = built.next()
+                symbol_output.write(symbol_text)
+                desc_output.write(desc_text)
+            else:
+                sym = buildSymbol(*job)
+                sym.writeSymbol(symbol_output)
+                sym.writeDescription(desc_output)
+            entries.append({'key': key, 'depends': depend, 'symbol': symbol_output.tell() - symbol_start, 'description': desc_output.tell() - desc_start})
+
+        if pool:
+            pool.close()
+            pool.join()
+            pool = None
+
+        if compact:
+            library_output.write(compactSymbols(symbol_output.getvalue()))
+            symbol_output = library_output
+
+        symbol_output.write(SYMBOL_FOOTER)
+        desc_output.write(DESC_FOOTER)
+
+        # Manifest is only valid for the outputs it was written with, so it is removed before they are replaced
+        for filename in [manifest, stale_manifest]:
+            if filename and os.path.isfile(filename):
+                os.remove(filename)
+        symbol_output.close()
+        desc_output.close()
+
+        if manifest:
+            atomicfile.write(manifest, json.dumps({'version': version, 'symbols': entries}))
+
+        if shard or shard_size:
+            writeShards(os.path.splitext(symbol_file)[0], symbol_jobs, entries, symbol_file, desc_file, shard, shard_size)
+    except:
+        # Workers of a failed build are stopped instead of finishing their remaining symbols
+        if pool:
+            pool.terminate()
+            pool.join()
+        for output in [symbol_output, library_output, desc_output]:
+            if isinstance(output, atomicfile.AtomicFile):
+                output.discard()
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Symbol generator from csv table.')
+    parser.add_argument('--csv', type = str, help = 'CSV formatted input table', required = True)
+    parser.add_argument('--symbol', type = str, help = 'Output file for generated KiCAD symbols', required = True)
+    parser.add_argument('--desc', type = str, help = 'Output file for generated KiCAD symbol description', required = True)
+    parser.add_argument('--template_path', type = str, help = 'Path to template symbols', required = True)
+    parser.add_argument('--table_path', type = str, help = 'Path to table based symbols', required = True)
+    parser.add_argument('--jobs', type = int, help = 'Number of worker processes used to build symbols', default = 1)
+    parser.add_argument('--manifest', type = str, help = 'Manifest file for incremental builds, only changed symbols are rebuilt')
+    parser.add_argument('--compact', action = 'store_true', help = 'Merge symbols only differing in name into one symbol with aliases (disables --manifest)')
+    parser.add_argument('--shard', choices = SHARD_MODES, help = 'Split library into libraries by footprint, value decade or series')
+    parser.add_argument('--shard_size', type = int, help = 'Split library into libraries of at most this many bytes', default = 0)
+    parser.add_argument('--sort', action = 'store_true', help = 'Write symbols in natural order of their names')
+    args = parser.parse_args()
+
+    try:
+        generate(args.csv, args.symbol, args.desc, args.template_path, args.table_path, args.jobs, args.manifest, args.compact, args.shard, args.shard_size, args.sort)
     except Exception as e:
-        if os.path.isfile(args.symbol):
-            os.remove(args.symbol)
-        if os.path.isfile(args.desc):
-            os.remove(args.desc)
         traceback.print_exc()
         sys.exit(2)
-#sym = symbol.Symbol()
-#sym.load("data/template/test.lib")
-#print sym.render_()
@@ -19,27 +19,33 @@
 
 import fp
 import os
+import fsindex
+import atomicfile
 from fp import cfg
 from fpgen import *
 import csv
 import argparse
+import multiprocessing
+import hashlib
+import json
+import sys
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description = 'Footprint generator from csv table.')
-    parser.add_argument('--csv', metavar = 'csv', type = str, help = 'CSV formatted input table', required = True)
-    parser.add_argument('--package_root', metavar = 'package_root', type = str, help = 'Root path for 3D models, searchpath will be root_path/csv_basename/symbol_name.wrl', required = True)
-    parser.add_argument('--output_path', metavar = 'output_path', type = str, help = 'Output path for generated KiCAD footprint files', required = True)
-    args = parser.parse_args()
+def read_rows(csv_file, package_root, output_path):
+    """Read csv table of one footprint family. Returns a list of (generator, parameters, output file) tuples"""
 
     # Extract family name from csv file name
-    package_family = os.path.splitext(os.path.basename(args.csv))[0]
+    package_family = os.path.splitext(os.path.basename(csv_file))[0]
 
 #   print fp.registry
 #   for fop in fp.registry.values():
 #       print fop
 #       print fop.__doc__
 
-    with open(args.csv, 'rb') as csvfile:
+    # Package directory is listed once instead of a stat call for every row, again if files were added or removed
+    packages = fsindex.load(package_root)
+
+    rows = []
+    with open(csv_file, 'rb') as csvfile:
         table = csv.reader(csvfile, delimiter=',', quotechar='\"')
         first_row = 1
         for row in table:
@@ -61,19 +67,111 @@ if __name__ == "__main__":
                 generator = data['generator']
                 del data['generator']
 
-                # Search for 3D model
-                model_file = os.path.join(args.package_root, package_family, data['name'] + ".wrl" )
-                if os.path.isfile(model_file):
-                    data['model'] = os.path.join(package_family, data['name'] + ".wrl" )
-                else:
-                    data['model'] = ''
-
-                if generator in fp.registry.keys():
-                    gen = fp.registry[generator](**data)
-
-                    output = open(args.output_path+'/'+data['name']+cfg.FOOTPRINT_EXTENSION, "w")
-                    output.write(gen.render())
-                    output.close()
-                    del gen
-                else:
-                    print "Unknown footprint generator '"+generator+"'"
+                # Search for 3D model, model file names may differ in case
+                model_file = packages.find(os.path.join(package_family, data['name'] + ".wrl"), True)
+                data['model'] = model_file if model_file else ''
+
+                rows.append((generator, data, output_path+'/'+data['name']+cfg.FOOTPRINT_EXTENSION))
+    return rows
+
+def row_stamp(generator, data):
+    """Deterministic edit timestamp derived from the content of a csv row"""
+    return int(hashlib.md5(json.dumps([generator, data], sort_keys = True)).hexdigest()[:8], 16)
+
+# Hash of generator and element sources and configuration for each generator name
+generator_versions = {}
+
+def source_file(module):
+    filename = module.__file__
+    if filename.endswith(".pyc"):
+        filename = filename[:-1]
+    return filename
+
+def generator_version(generator):
+    """Hash of everything, besides the csv row, a generated footprint depends on"""
+    if generator not in generator_versions:
+        md5 = hashlib.md5()
+        for module in [fp, sys.modules[fp.registry[generator].__module__]]:
+            with open(source_file(module), "rb") as file:
+                md5.update(file.read())
+        md5.update(json.dumps(cfg.dict(), sort_keys = True))
+        generator_versions[generator] = md5.hexdigest()
+    return generator_versions[generator]
+
+def cache_key(generator, data, deterministic):
+    """Content address of a generated footprint. The model path is part of data"""
+    return hashlib.md5(json.dumps([generator_version(generator), generator, data, deterministic], sort_keys = True)).hexdigest()
+
+def render_row(row):
+    """Generate one footprint file, the file is only written if its content changed.
+        If a cache path is given, footprints are taken from or stored to it.
+    """
+    generator, data, output_file, deterministic, cache_path = row
+    if generator in fp.registry.keys():
+        text = None
+        if cache_path:
+            cache_file = os.path.join(cache_path, cache_key(generator, data, deterministic) + cfg.FOOTPRINT_EXTENSION)
+            if os.path.isfile(cache_file):
+                with open(cache_file, "r") as file:
+                    text = file.read()
+
+        if text is None:
+            gen = fp.registry[generator](**data)
+            if deterministic:
+                gen.tedit = row_stamp(generator, data)
+            text = gen.render()
+            del gen
+
+            if cache_path:
+                # Cache may be shared by several checkouts, so it is written atomically as well
+                atomicfile.write(cache_file, text)
+
+        if os.path.isfile(output_file):
+            with open(output_file, "r") as file:
+                if file.read() == text:
+                    return
+
+        atomicfile.write(output_file, text)
+    else:
+        print "Unknown footprint generator '"+generator+"'"
+
+def generate(csv_files, package_root, output_paths, jobs = 1, deterministic = False, cache_path = None):
+    """Generate footprint files of all families. csv_files and output_paths are lists of equal length.
+        deterministic - Use a hash of the csv row instead of the current time as edit timestamp
+        cache_path - Directory of previously generated footprints, addressed by a hash of their inputs
+    """
+    if cache_path and not os.path.isdir(cache_path):
+        os.makedirs(cache_path)
+
+    rows = []
+    for csv_file, output_path in zip(csv_files, output_paths):
+        rows.extend([row + (deterministic, cache_path) for row in read_rows(csv_file, package_root, output_path)])
+
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            pool.map(render_row, rows, max(1, len(rows) / (jobs * 4)))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        for row in rows:
+            render_row(row)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Footprint generator from csv table.')
+    parser.add_argument('--csv', metavar = 'csv', nargs = '+', type = str, help = 'CSV formatted input tables', required = True)
+    parser.add_argument('--package_root', metavar = 'package_root', type = str, help = 'Root path for 3D models, searchpath will be root_path/csv_basename/symbol_name.wrl', required = True)
+    parser.add_argument('--output_path', metavar = 'output_path', nargs = '+', type = str, help = 'Output path for generated KiCAD footprint files, one for each csv table', required = True)
+    parser.add_argument('--jobs', type = int, help = 'Number of worker processes used to generate footprints', default = 1)
+    parser.add_argument('--deterministic', action = 'store_true', help = 'Derive edit timestamp from csv row instead of current time')
+    parser.add_argument('--cache', type = str, help = 'Cache directory for generated footprints')
+    args = parser.parse_args()
+
+    if len(args.csv) != len(args.output_path):
+        parser.error("Number of csv tables and output paths differ")
+
+    generate(args.csv, args.package_root, args.output_path, args.jobs, args.deterministic, args.cache)
@@ -19,9 +19,11 @@
 
 import time
 import math
+import StringIO
+import array
 import config
 
-cfg = config.Config("config")
+cfg = config.load("config")
 
 registry = {}
 
@@ -43,77 +45,127 @@ class type():
     trapezoid = "trapezoid"
 
 
-class text():
+# Coordinates and sizes are stored as integer nanometers like KiCAD does internally
+NM_PER_MM = 1000000
+
+def nm(value):
+    """Millimeters to integer nanometers"""
+    return int(round(value * NM_PER_MM))
+
+# Formatted values, footprints reuse few distinct coordinates and sizes
+mm_cache = {}
+
+def mm(value):
+    """Format integer nanometers as millimeters with three decimals, rounded half away from zero"""
+    if value in mm_cache:
+        return mm_cache[value]
+    if value < 0:
+        um = (500 - value) // 1000
+        result = "-%d.%03d"%divmod(um, 1000) if um else "0.000"
+    else:
+        result = "%d.%03d"%divmod((value + 500) // 1000, 1000)
+    mm_cache[value] = result
+    return result
+
+def mm_column(values):
+    """Format a column of integer nanometers, see mm()"""
+    cache = mm_cache
+    return [cache[value] if value in cache else mm(value) for value in values]
+
+def to_mm(value):
+    """Integer nanometers to millimeters"""
+    return float(value) / NM_PER_MM
+
+class element(object):
+    """Base class of footprint elements, render() returns the text written by render_to()"""
+
+    def render_to(self, stream):
+        stream.write(self.render())
+
+class group(element):
+    """Element composed of other elements, rendered directly to the stream"""
+
+    def render_to(self, stream):
+        for element in self.elements:
+            element.render_to(stream)
+
+    def render(self):
+        buffer = StringIO.StringIO()
+        self.render_to(buffer)
+        return buffer.getvalue()
+
+class text(element):
     """Generate text at x/y"""
-    format = """  (fp_text %s %s (at %.3f %.3f %.3f) (layer %s)
-    (effects (font (size %.3f %.3f) (thickness %.3f)))
+    format = """  (fp_text %s %s (at %s %s %.3f) (layer %s)
+    (effects (font (size %s %s) (thickness %s)))
   )\n"""
 
     def __init__(self, layer, name, value, x, y, angle, size, thickness):
         self.layer = layer
         self.name = name
         self.value = value
-        self.x = x
-        self.y = y
+        self.x = nm(x)
+        self.y = nm(y)
         self.angle = angle
-        self.size = size
-        self.thickness = thickness
+        self.size = nm(size)
+        self.thickness = nm(thickness)
 
     def render(self):
-        return text.format%(self.name, self.value, self.x, self.y, self.angle, self.layer, self.size, self.size, self.thickness)
+        size = mm(self.size)
+        return text.format%(self.name, self.value, mm(self.x), mm(self.y), self.angle, self.layer, size, size, mm(self.thickness))
 
-class line():
+class line(element):
     """Generate line from x1/y1 to x2/y2"""
-    format = "  (fp_line (start %.3f %.3f) (end %.3f %.3f) (layer %s) (width %.3f))\n"
+    format = "  (fp_line (start %s %s) (end %s %s) (layer %s) (width %s))\n"
 
     def __init__(self, layer, x1, y1, x2, y2, width):
         self.layer = layer
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.width = width
+        self.x1 = nm(x1)
+        self.y1 = nm(y1)
+        self.x2 = nm(x2)
+        self.y2 = nm(y2)
+        self.width = nm(width)
 
     def render(self):
-        return line.format%(self.x1, self.y1, self.x2, self.y2, self.layer, self.width)
+        return line.format%(mm(self.x1), mm(self.y1), mm(self.x2), mm(self.y2), self.layer, mm(self.width))
 
-class arc():
+class arc(element):
     """Generate arc between x1/y1 and x2/y2 with given angle"""
 
-    format = "  (fp_arc (start %.3f %.3f) (end %.3f %.3f) (angle %.3f) (layer %s) (width %.3f))\n"
+    format = "  (fp_arc (start %s %s) (end %s %s) (angle %.3f) (layer %s) (width %s))\n"
 
     def __init__(self, layer, x1, y1, x2, y2, angle, width):
         self.layer = layer
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
+        self.x1 = nm(x1)
+        self.y1 = nm(y1)
+        self.x2 = nm(x2)
+        self.y2 = nm(y2)
         self.angle = angle
-        self.width = width
+        self.width = nm(width)
 
     def area(self):
-        return {'x1': self.x1, 'y1': self.y1, 'x2': self.x2, 'y2': self.y2}
+        return {'x1': to_mm(self.x1), 'y1': to_mm(self.y1), 'x2': to_mm(self.x2), 'y2': to_mm(self.y2)}
 
     def render(self):
-        return arc.format%(self.x1, self.y1, self.x2, self.y2, self.angle, self.layer, self.width)
+        return arc.format%(mm(self.x1), mm(self.y1), mm(self.x2), mm(self.y2), self.angle, self.layer, mm(self.width))
 
-class circle():
+class circle(element):
     """Generate circle with center x1/y1 and radius through point x2/y2"""
 
-    format = "  (fp_circle (center %.3f %.3f) (end %.3f %.3f) (layer %s) (width %.3f))\n"
+    format = "  (fp_circle (center %s %s) (end %s %s) (layer %s) (width %s))\n"
 
     def __init__(self, layer, x1, y1, x2, y2, width):
         self.layer = layer
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.width = width
+        self.x1 = nm(x1)
+        self.y1 = nm(y1)
+        self.x2 = nm(x2)
+        self.y2 = nm(y2)
+        self.width = nm(width)
 
     def render(self):
-        return circle.format%(self.x1, self.y1, self.x2, self.y2, self.layer, self.width)
+        return circle.format%(mm(self.x1), mm(self.y1), mm(self.x2), mm(self.y2), self.layer, mm(self.width))
 
-class rectangle():
+class rectangle(group):
     """Generate rectangle on given layer"""
 
     def __init__(self, layer, x, y, width, height, line_width, centered = False):
@@ -127,13 +179,8 @@ class rectangle():
         self.elements.append(line(layer, x + width, y + height, x, y + height, line_width))
         self.elements.append(line(layer, x, y + height, x, y, line_width))
 
-    def render(self):
-        result = ""
-        for element in self.elements:
-            result += element.render()
-        return result
 
-class beveled_rectangle():
+class beveled_rectangle(group):
     """Rectangle with beveled edges"""
 
     def __init__(self, layer, x, y, width, height, bevel, line_width, centered = False):
@@ -151,13 +198,8 @@ class beveled_rectangle():
         self.elements.append(line(layer, x, y + height - bevel, x, y + bevel, line_width))                           # |
         self.elements.append(line(layer, x, y + bevel, x + bevel, y, line_width))                                    # /
 
-    def render(self):
-        result = ""
-        for element in self.elements:
-            result += element.render()
-        return result
 
-class beveled_outline():
+class beveled_outline(group):
     """Outline with beveled corners every grid point"""
 
     def __init__(self, layer, x, y, width, height, bevel, grid, line_width, centered = False):
@@ -193,35 +235,75 @@ class beveled_outline():
             self.elements.append(line(layer, x, i * grid + y + grid - bevel, x, i * grid + y + bevel, line_width))
             self.elements.append(line(layer, x, i * grid + y + bevel, x + bevel, i * grid + y, line_width))
 
-    def render(self):
-        result = ""
-        for element in self.elements:
-            result += element.render()
-        return result
 
-class pad():
+class pad(element):
     """Generate pad in x/y with size width/height in given technology/type"""
 
-    format = "  (pad %s %s %s (at %.3f %.3f %.3f) (size %.3f %.3f) %s(layers %s))\n"
-    format_drill = "(drill %.3f) "
+    format = "  (pad %s %s %s (at %s %s %.3f) (size %s %s) %s(layers %s))\n"
+    format_drill = "(drill %s) "
 
     def __init__(self, layers, name, tech, type, x, y, width, height, drill = 0, angle = 0):
         self.layers = layers
         self.name = name
         self.tech = tech
         self.type = type
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        if drill:
-            self.drill = pad.format_drill%(drill)
-        else:
-            self.drill = ""
+        self.x = nm(x)
+        self.y = nm(y)
+        self.width = nm(width)
+        self.height = nm(height)
+        self.drill = nm(drill)
         self.angle = angle
 
     def render(self):
-        return pad.format%(self.name, self.tech, self.type, self.x, self.y, self.angle, self.width, self.height, self.drill, self.layers)
+        drill = pad.format_drill%(mm(self.drill)) if self.drill else ""
+        return pad.format%(self.name, self.tech, self.type, mm(self.x), mm(self.y), self.angle, mm(self.width), mm(self.height), drill, self.layers)
+
+class pad_table(element):
+    """Pads of a footprint stored column wise. Layer, technology and type strings are interned.
+        All pads are formatted in one pass with the format of pad.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.x = array.array('l')
+        self.y = array.array('l')
+        self.width = array.array('l')
+        self.height = array.array('l')
+        self.drill = array.array('l')
+        self.angle = array.array('d')
+        self.layers = array.array('H')
+        self.tech = array.array('H')
+        self.type = array.array('H')
+        self.strings = []
+        self.string_index = {}
+
+    def intern(self, value):
+        """Index of value in the string table"""
+        if value not in self.string_index:
+            self.string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.string_index[value]
+
+    def add(self, layers, name, tech, type, x, y, width, height, drill = 0, angle = 0):
+        self.names.append(name)
+        self.x.append(nm(x))
+        self.y.append(nm(y))
+        self.width.append(nm(width))
+        self.height.append(nm(height))
+        self.drill.append(nm(drill))
+        self.angle.append(angle)
+        self.layers.append(self.intern(layers))
+        self.tech.append(self.intern(tech))
+        self.type.append(self.intern(type))
+
+    def __len__(self):
+        return len(self.names)
+
+    def render(self):
+        strings = self.strings
+        drills = [pad.format_drill%(text) if drill else "" for drill, text in zip(self.drill, mm_column(self.drill))]
+        return "".join([pad.format%(name, strings[tech], strings[type], x, y, angle, width, height, drill, strings[layers])
+            for name, tech, type, x, y, angle, width, height, drill, layers in zip(self.names, self.tech, self.type, mm_column(self.x), mm_column(self.y), self.angle, mm_column(self.width), mm_column(self.height), drills, self.layers)])
 
 # Base class for footprints
 class base(object):
@@ -234,6 +316,10 @@ class base(object):
         self.tags = tags
         self.smd = smd
         self.elements = []
+        # Pads added with add_pad(), inserted into elements with the first pad
+        self.pads = None
+        # Timestamp of last edit, current time if None
+        self.tedit = None
 
         if add_text:
             self.elements.append(text(cfg.FOOTPRINT_REFERENCE_LAYER, "reference", "REF**", 0, 0, 0, cfg.FOOTPRINT_REFERENCE_FONT_SIZE, cfg.FOOTPRINT_REFERENCE_FONT_THICKNESS))
@@ -242,25 +328,40 @@ class base(object):
     def add(self, element):
         self.elements.append(element)
 
+    def add_pad(self, layers, name, tech, type, x, y, width, height, drill = 0, angle = 0):
+        """Add a pad to the pad table of the footprint, same arguments as pad"""
+        if self.pads is None:
+            self.pads = pad_table()
+            self.elements.append(self.pads)
+        self.pads.add(layers, name, tech, type, x, y, width, height, drill, angle)
+
     def remove(self, index):
         self.elements.remove(index)
 
-    def render(self):
-        result = '(module %s (tedit %.8X)\n'%(self.name, int(time.time()))
+    def render_to(self, stream):
+        if self.tedit is None:
+            tedit = int(time.time())
+        else:
+            tedit = self.tedit
+        stream.write('(module %s (tedit %.8X)\n'%(self.name, tedit))
         if self.smd:
-            result += '  (attr smd)\n'
+            stream.write('  (attr smd)\n')
 
         if len(self.description):
-            result += '  (descr "'+self.description+'")\n'
+            stream.write('  (descr "'+self.description+'")\n')
 
         if len(self.tags):
-            result += '  (tags "'+self.tags+'")\n'
+            stream.write('  (tags "'+self.tags+'")\n')
 
         for element in self.elements:
-            result += element.render()
+            element.render_to(stream)
 
         if len(self.model):
-            result += '  (model '+self.model+'\n    (at (xyz 0 0 0))\n    (scale (xyz 1 1 1))\n    (rotate (xyz 0 0 0))\n  )\n'
+            stream.write('  (model '+self.model+'\n    (at (xyz 0 0 0))\n    (scale (xyz 1 1 1))\n    (rotate (xyz 0 0 0))\n  )\n')
+
+        stream.write(')\n')
 
-        result += ')\n'
-        return result
+    def render(self):
+        buffer = StringIO.StringIO()
+        self.render_to(buffer)
+        return buffer.getvalue()
@@ -0,0 +1,317 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Design rule check of footprints: pad to pad clearance, pad to silkscreen overlap
+# and courtyard containment. Candidate pairs are taken from a uniform grid.
+
+import os
+import sys
+import math
+import argparse
+import fp
+from fp import cfg
+import footprint
+import fpread
+
+# Shapes are ('box', x1, y1, x2, y2) or ('seg', x1, y1, x2, y2, radius).
+# A circle is a segment of zero length, an oval a segment with the radius of its smaller side.
+
+# Tolerance for rounding of rendered coordinates
+EPSILON = 0.0005
+# Line segments per full circle, used for silkscreen circles and arcs
+CIRCLE_SEGMENTS = 32
+
+def rotate(x, y, angle):
+    """Rotate x/y by angle in degrees like KiCAD does (y axis pointing down)"""
+    angle = math.radians(angle)
+    return (x * math.cos(angle) + y * math.sin(angle), -x * math.sin(angle) + y * math.cos(angle))
+
+def pad_shape(type, x, y, width, height, angle):
+    """Shape of a pad. Rectangular pads at angles other than multiples of 90 degrees use their bounding box."""
+    if type in (fp.type.circle, fp.type.oval):
+        radius = min(width, height) / 2
+        dx, dy = rotate(width / 2 - radius, height / 2 - radius, angle)
+        return ('seg', x - dx, y - dy, x + dx, y + dy, radius)
+
+    dx, dy = rotate(width / 2, height / 2, angle)
+    ex, ey = rotate(width / 2, -height / 2, angle)
+    dx = max(abs(dx), abs(ex))
+    dy = max(abs(dy), abs(ey))
+    return ('box', x - dx, y - dy, x + dx, y + dy)
+
+def arc_shapes(cx, cy, x, y, angle, width):
+    """Line segments approximating an arc around cx/cy starting at x/y"""
+    count = max(1, int(math.ceil(abs(angle) / 360.0 * CIRCLE_SEGMENTS)))
+    shapes = []
+    x1, y1 = x, y
+    for i in range(1, count + 1):
+        dx, dy = rotate(x - cx, y - cy, -angle * i / count)
+        x2, y2 = cx + dx, cy + dy
+        shapes.append(('seg', x1, y1, x2, y2, width / 2))
+        x1, y1 = x2, y2
+    return shapes
+
+def bounds(shape):
+    """Bounding box of a shape"""
+    if shape[0] == 'box':
+        return shape[1:5]
+    x1, y1, x2, y2, radius = shape[1:]
+    return (min(x1, x2) - radius, min(y1, y2) - radius, max(x1, x2) + radius, max(y1, y2) + radius)
+
+def point_segment(px, py, x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    length = dx * dx + dy * dy
+    t = 0.0
+    if length:
+        t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length))
+    return math.hypot(px - x1 - t * dx, py - y1 - t * dy)
+
+def cross(ax, ay, bx, by, cx, cy):
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+def segment_segment(a, b):
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    d1 = cross(bx1, by1, bx2, by2, ax1, ay1)
+    d2 = cross(bx1, by1, bx2, by2, ax2, ay2)
+    d3 = cross(ax1, ay1, ax2, ay2, bx1, by1)
+    d4 = cross(ax1, ay1, ax2, ay2, bx2, by2)
+    if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and ((d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)):
+        return 0.0
+    return min(point_segment(ax1, ay1, bx1, by1, bx2, by2), point_segment(ax2, ay2, bx1, by1, bx2, by2),
+        point_segment(bx1, by1, ax1, ay1, ax2, ay2), point_segment(bx2, by2, ax1, ay1, ax2, ay2))
+
+def point_box(px, py, box):
+    x1, y1, x2, y2 = box
+    return math.hypot(max(x1 - px, 0, px - x2), max(y1 - py, 0, py - y2))
+
+def segment_box(segment, box):
+    x1, y1, x2, y2 = box
+    distance = min(point_box(segment[0], segment[1], box), point_box(segment[2], segment[3], box))
+    if distance == 0:
+        return distance
+    for edge in ((x1, y1, x2, y1), (x2, y1, x2, y2), (x2, y2, x1, y2), (x1, y2, x1, y1)):
+        distance = min(distance, segment_segment(segment, edge))
+    return distance
+
+def distance(a, b):
+    """Distance between the outlines of two shapes, negative or zero if they overlap"""
+    if a[0] == 'box' and b[0] == 'box':
+        ax1, ay1, ax2, ay2 = a[1:]
+        bx1, by1, bx2, by2 = b[1:]
+        gap_x = max(ax1 - bx2, bx1 - ax2)
+        gap_y = max(ay1 - by2, by1 - ay2)
+        if gap_x < 0 and gap_y < 0:
+            return max(gap_x, gap_y)
+        return math.hypot(max(gap_x, 0), max(gap_y, 0))
+    if a[0] == 'seg' and b[0] == 'seg':
+        return segment_segment(a[1:5], b[1:5]) - a[5] - b[5]
+    if a[0] == 'box':
+        a, b = b, a
+    return segment_box(a[1:5], b[1:5]) - a[5]
+
+class grid(object):
+    """Uniform grid of shape bounding boxes. Shapes are stored in every cell they touch."""
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = {}
+
+    def cell_range(self, box, margin):
+        x1, y1, x2, y2 = box
+        return (int(math.floor((x1 - margin) / self.size)), int(math.floor((y1 - margin) / self.size)),
+            int(math.floor((x2 + margin) / self.size)), int(math.floor((y2 + margin) / self.size)))
+
+    def insert(self, index, box):
+        cx1, cy1, cx2, cy2 = self.cell_range(box, 0)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+
+    def query(self, box, margin):
+        """Indexes of all shapes with a cell within margin of box"""
+        result = set()
+        cx1, cy1, cx2, cy2 = self.cell_range(box, margin)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                result.update(self.cells.get((cx, cy), ()))
+        return result
+
+def copper_sides(layers):
+    """Copper sides ('F', 'B') of a pad layer list"""
+    layers = layers.split()
+    if "*.Cu" in layers:
+        return set(['F', 'B'])
+    return set([layer[0] for layer in layers if layer in ("F.Cu", "B.Cu")])
+
+class geometry(object):
+    """Pads, silkscreen and courtyard shapes of one footprint"""
+
+    def __init__(self):
+        # List of (name, copper sides, shape)
+        self.pads = []
+        # Lists of (side, shape)
+        self.silk = []
+        self.courtyard = []
+
+    def add_pad(self, name, type, layers, x, y, width, height, angle):
+        self.pads.append((name, copper_sides(layers), pad_shape(type, x, y, width, height, angle)))
+
+    def add_graphic(self, layer, shapes):
+        if layer in ("F.SilkS", "B.SilkS"):
+            self.silk.extend([(layer[0], shape) for shape in shapes])
+        elif layer in ("F.CrtYd", "B.CrtYd"):
+            self.courtyard.extend([(layer[0], shape) for shape in shapes])
+
+def add_element(result, element):
+    """Add shapes of an fp element and its children, element coordinates are integer nanometers"""
+    mm = fp.to_mm
+    if isinstance(element, fp.group):
+        for child in element.elements:
+            add_element(result, child)
+    elif isinstance(element, fp.pad_table):
+        strings = element.strings
+        for i in range(len(element)):
+            result.add_pad(element.names[i], strings[element.type[i]], strings[element.layers[i]], mm(element.x[i]), mm(element.y[i]), mm(element.width[i]), mm(element.height[i]), element.angle[i])
+    elif isinstance(element, fp.pad):
+        result.add_pad(element.name, element.type, element.layers, mm(element.x), mm(element.y), mm(element.width), mm(element.height), element.angle)
+    elif isinstance(element, fp.line):
+        result.add_graphic(element.layer, [('seg', mm(element.x1), mm(element.y1), mm(element.x2), mm(element.y2), mm(element.width) / 2)])
+    elif isinstance(element, fp.circle):
+        result.add_graphic(element.layer, arc_shapes(mm(element.x1), mm(element.y1), mm(element.x2), mm(element.y2), 360, mm(element.width)))
+    elif isinstance(element, fp.arc):
+        result.add_graphic(element.layer, arc_shapes(mm(element.x1), mm(element.y1), mm(element.x2), mm(element.y2), element.angle, mm(element.width)))
+
+def footprint_geometry(footprint):
+    """Geometry of an in-memory footprint (fp.base)"""
+    result = geometry()
+    for element in footprint.elements:
+        add_element(result, element)
+    return result
+
+def file_geometry(filename):
+    """Geometry of a .kicad_mod file"""
+    return footprint_geometry(fpread.read(filename))
+
+# Available checks
+CHECKS = ["pad", "silk", "courtyard"]
+
+def check(geometry, clearance, silk_clearance, checks = CHECKS):
+    """Returns a list of violation messages of a footprint geometry"""
+    violations = []
+    pads = geometry.pads
+    if not len(pads):
+        return violations
+
+    # Cell size follows the typical pad size, so every pad touches only a few cells
+    sizes = sorted([max(bounds(shape)[2] - bounds(shape)[0], bounds(shape)[3] - bounds(shape)[1]) for name, sides, shape in pads])
+    index = grid(max(sizes[len(sizes) / 2], clearance, 0.1))
+    for i, (name, sides, shape) in enumerate(pads):
+        index.insert(i, bounds(shape))
+
+    # Pads with equal names are connected, they may overlap to form complex shapes
+    for i, (name, sides, shape) in enumerate(pads if "pad" in checks else []):
+        for j in sorted(index.query(bounds(shape), clearance)):
+            if j <= i:
+                continue
+            other_name, other_sides, other_shape = pads[j]
+            if (name and name == other_name) or not (sides & other_sides):
+                continue
+            gap = distance(shape, other_shape)
+            if gap < clearance - EPSILON:
+                violations.append("pad %s and pad %s: clearance %.3f < %.3f"%(name, other_name, gap, clearance))
+
+    for side, shape in geometry.silk if "silk" in checks else []:
+        for j in sorted(index.query(bounds(shape), silk_clearance)):
+            name, sides, other_shape = pads[j]
+            if side not in sides:
+                continue
+            gap = distance(shape, other_shape)
+            if gap < silk_clearance - EPSILON:
+                x1, y1, x2, y2 = shape[1:5]
+                violations.append("silkscreen (%.3f %.3f)-(%.3f %.3f) and pad %s: clearance %.3f < %.3f"%(x1, y1, x2, y2, name, gap, silk_clearance))
+
+    # Courtyard is checked against the bounding box of all courtyard lines
+    if "courtyard" in checks and len(geometry.courtyard):
+        boxes = [bounds(shape) for side, shape in geometry.courtyard]
+        x1 = min([box[0] for box in boxes])
+        y1 = min([box[1] for box in boxes])
+        x2 = max([box[2] for box in boxes])
+        y2 = max([box[3] for box in boxes])
+        for name, sides, shape in pads:
+            px1, py1, px2, py2 = bounds(shape)
+            if px1 < x1 - EPSILON or py1 < y1 - EPSILON or px2 > x2 + EPSILON or py2 > y2 + EPSILON:
+                violations.append("pad %s: outside of courtyard"%(name))
+
+    return violations
+
+def footprint_files(paths):
+    """All footprint files in the given files and directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(cfg.FOOTPRINT_EXTENSION):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def check_files(paths, clearance, silk_clearance, checks = CHECKS):
+    """Check footprint files. Returns a list of (file name, violations) of all footprints with violations"""
+    result = []
+    for filename in footprint_files(paths):
+        violations = check(file_geometry(filename), clearance, silk_clearance, checks)
+        if len(violations):
+            result.append((filename, violations))
+    return result
+
+def check_csv(csv_files, package_root, clearance, silk_clearance, checks = CHECKS):
+    """Check footprints of csv tables without writing them. Returns a list of (footprint name, violations)"""
+    result = []
+    for csv_file in csv_files:
+        for generator, data, output_file in footprint.read_rows(csv_file, package_root, ""):
+            if generator not in fp.registry:
+                continue
+            try:
+                violations = check(footprint_geometry(fp.registry[generator](**data)), clearance, silk_clearance, checks)
+            except Exception as e:
+                violations = ["generator %s failed: %s"%(generator, e)]
+            if len(violations):
+                result.append((data['name'], violations))
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Design rule check of footprints.')
+    parser.add_argument('paths', nargs = '*', type = str, help = 'Footprint files or directories (default: modules)')
+    parser.add_argument('--csv', nargs = '+', type = str, help = 'Check footprints generated from csv tables instead of files')
+    parser.add_argument('--package_root', type = str, help = 'Package root directory', default = "packages")
+    parser.add_argument('--clearance', type = float, help = 'Minimal pad to pad clearance in mm', default = cfg.FOOTPRINT_PAD_CLEARANCE)
+    parser.add_argument('--silk_clearance', type = float, help = 'Minimal pad to silkscreen clearance in mm', default = cfg.FOOTPRINT_SILK_CLEARANCE)
+    parser.add_argument('--checks', nargs = '+', choices = CHECKS, help = 'Checks to run (default: all)', default = CHECKS)
+    args = parser.parse_args()
+
+    if args.csv:
+        result = check_csv(args.csv, args.package_root, args.clearance, args.silk_clearance, args.checks)
+    else:
+        result = check_files(args.paths if len(args.paths) else ["modules"], args.clearance, args.silk_clearance, args.checks)
+
+    for name, violations in result:
+        for violation in violations:
+            print "%s: %s"%(name, violation)
+    sys.exit(1 if len(result) else 0)
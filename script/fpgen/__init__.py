@@ -1,5 +1,5 @@
 __all__ = [
-#	"bga",
+	"bga",
 	"chip",
 	"connector",
 	"dip",
@@ -1,8 +1,65 @@
 import fp
 from fp import cfg
 
+# JEDEC row letters, I, O, Q, S, X and Z are not used
+ROW_LETTERS = "ABCDEFGHJKLMNPRTUVWY"
+
+def row_names(count):
+	"""Row names A, B, ..., Y, AA, AB, ..., AY, BA, ... for count rows"""
+	names = list(ROW_LETTERS[:count])
+	for prefix in ROW_LETTERS:
+		if len(names) >= count:
+			break
+		names.extend([prefix + letter for letter in ROW_LETTERS[:count - len(names)]])
+	return names
+
+def ball_positions(count, grid):
+	"""Centered ball positions of one axis"""
+	offset = (count - 1) / 2.0
+	return [(i - offset) * grid for i in range(count)]
+
 class bga(fp.base):
-	"""Generator for ball grid array footprints"""
+	"""Generator for ball grid array footprints
+		pad_rings - Number of populated rings from the outside, 0 for a full array
+		pad_missing - Space separated ball names, which are not populated (e.g. "A1 B2")
+	"""
+
+	def __init__(self, name, model, description, tags, package_width, package_height, pad_diameter, pad_grid, pad_count_x, pad_count_y, pad_rings = 0, pad_missing = ""):
+		super(bga, self).__init__(name, model, description, tags, True, False)
+
+		pad_rings = int(pad_rings)
+		missing = set(str(pad_missing).split())
+
+		fp.base.add(self, fp.text(cfg.FOOTPRINT_REFERENCE_LAYER, "reference", "REF**", 0, -package_height / 2 - cfg.FOOTPRINT_REFERENCE_FONT_SIZE, 0, cfg.FOOTPRINT_REFERENCE_FONT_SIZE, cfg.FOOTPRINT_REFERENCE_FONT_THICKNESS))
+		fp.base.add(self, fp.text(cfg.FOOTPRINT_VALUE_LAYER, "value", "VAL**", 0, 0, 0, cfg.FOOTPRINT_VALUE_FONT_SIZE, cfg.FOOTPRINT_VALUE_FONT_THICKNESS))
+		fp.base.add(self, fp.rectangle(cfg.FOOTPRINT_PACKAGE_LAYER, 0, 0, package_width, package_height, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH, True))
+
+		# Ball A1 marker in the upper left corner. The bevel is limited to the margin between package outline and ball field,
+		# so it never crosses a ball. Without such a margin it is drawn outside of the package corner.
+		line_x = package_width / 2
+		line_y = package_height / 2
+		bevel = min(package_width, package_height) * 0.1
+		margin = min(line_x - (pad_count_x - 1) * pad_grid / 2.0, line_y - (pad_count_y - 1) * pad_grid / 2.0) - pad_diameter / 2.0
+		margin -= cfg.FOOTPRINT_SILK_CLEARANCE + cfg.FOOTPRINT_PACKAGE_LINE_WIDTH / 2.0
+		if margin > cfg.FOOTPRINT_PACKAGE_LINE_WIDTH:
+			bevel = min(bevel, margin)
+			fp.base.add(self, fp.line(cfg.FOOTPRINT_PACKAGE_LAYER, -line_x, -line_y + bevel, -line_x + bevel, -line_y, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH))
+		else:
+			fp.base.add(self, fp.line(cfg.FOOTPRINT_PACKAGE_LAYER, -line_x - bevel, -line_y, -line_x, -line_y - bevel, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH))
+
+		# Coordinates and names are computed once per row and column, balls are combined from them
+		rows = row_names(pad_count_y)
+		columns = [str(i + 1) for i in range(pad_count_x)]
+		xs = ball_positions(pad_count_x, pad_grid)
+		ys = ball_positions(pad_count_y, pad_grid)
+		depth_x = [min(i, pad_count_x - 1 - i) for i in range(pad_count_x)]
+		depth_y = [min(j, pad_count_y - 1 - j) for j in range(pad_count_y)]
 
-	def __init__(self, name, model, description, tags, package_width, package_height, pad_diameter, pad_grid, pad_distance, count_x, count_y):
-		super(bga, self).__init__(name, model, description, tags)
+		for row, y, dy in zip(rows, ys, depth_y):
+			for column, x, dx in zip(columns, xs, depth_x):
+				if pad_rings and min(dx, dy) >= pad_rings:
+					continue
+				ball = row + column
+				if ball in missing:
+					continue
+				fp.base.add_pad(self, cfg.FOOTPRINT_SMD_LAYERS, ball, fp.technology.smd, fp.type.circle, x, y, pad_diameter, pad_diameter)
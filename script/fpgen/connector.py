@@ -18,9 +18,9 @@ class connector_grid_male(fp.base):
 			x = pad_grid * -((float(pin_count_x) / 2) - 0.5)
 			for j in range(pin_count_x):
 				if pin == 1:
-					fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.rect, x, y, pad_diameter, pad_diameter, pad_drill))
+					fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.rect, x, y, pad_diameter, pad_diameter, pad_drill)
 				else:
-					fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.circle, x, y, pad_diameter, pad_diameter, pad_drill))
+					fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.circle, x, y, pad_diameter, pad_diameter, pad_drill)
 
 				pin += 1
 				x += pad_grid
@@ -43,9 +43,9 @@ class connector_grid_female(fp.base):
 			x = pad_grid * ((float(pin_count_x) / 2) - 0.5)
 			for j in range(pin_count_x):
 				if pin == 1:
-					fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.rect, x, y, pad_diameter, pad_diameter, pad_drill))
+					fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.rect, x, y, pad_diameter, pad_diameter, pad_drill)
 				else:
-					fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.circle, x, y, pad_diameter, pad_diameter, pad_drill))
+					fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.circle, x, y, pad_diameter, pad_diameter, pad_drill)
 
 				pin += 1
 				x -= pad_grid
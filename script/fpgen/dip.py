@@ -20,11 +20,11 @@ class dip(fp.base):
 		fp.base.add(self, fp.rectangle(cfg.FOOTPRINT_PACKAGE_LAYER, 0, 0, package_width, package_height, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH, True))
 		fp.base.add(self, fp.arc(cfg.FOOTPRINT_PACKAGE_LAYER, -line_x, 0, -line_x, 1.0, -180, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH))
 		for i in range(pad_count / 2):
-			fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.oval, x, pad_distance / 2, pad_width, pad_height, pad_drill))
+			fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.oval, x, pad_distance / 2, pad_width, pad_height, pad_drill)
 			x += pad_grid
 			pin += 1
 
 		for i in range(pad_count / 2, pad_count):
 			x -= pad_grid
-			fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.oval, x, -pad_distance / 2, pad_width, pad_height, pad_drill))
+			fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, pin, fp.technology.thru_hole, fp.type.oval, x, -pad_distance / 2, pad_width, pad_height, pad_drill)
 			pin += 1
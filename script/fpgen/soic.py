@@ -25,11 +25,11 @@ class soic(fp.base):
 		line_y += diff
 		fp.base.add(self, fp.circle(cfg.FOOTPRINT_PACKAGE_LAYER, x, line_y, x - 0.3, line_y, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH))
 		for i in range(pad_count / 2):
-			fp.base.add(self, fp.pad(cfg.FOOTPRINT_SMD_LAYERS, pin, fp.technology.smd, fp.type.rect, x, pad_distance / 2, pad_width, pad_height))
+			fp.base.add_pad(self, cfg.FOOTPRINT_SMD_LAYERS, pin, fp.technology.smd, fp.type.rect, x, pad_distance / 2, pad_width, pad_height)
 			x += pad_grid
 			pin += 1
 
 		for i in range(pad_count / 2, pad_count):
 			x -= pad_grid
-			fp.base.add(self, fp.pad(cfg.FOOTPRINT_SMD_LAYERS, pin, fp.technology.smd, fp.type.rect, x, -pad_distance / 2, pad_width, pad_height))
+			fp.base.add_pad(self, cfg.FOOTPRINT_SMD_LAYERS, pin, fp.technology.smd, fp.type.rect, x, -pad_distance / 2, pad_width, pad_height)
 			pin += 1
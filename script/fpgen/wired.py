@@ -15,5 +15,5 @@ class wired_resistor(fp.base):
 
 		bevel = math.sqrt(package_width * package_width + package_height * package_height) * 0.1
 		fp.base.add(self, fp.beveled_rectangle(cfg.FOOTPRINT_PACKAGE_LAYER, 0, 0, package_width, package_height, bevel, cfg.FOOTPRINT_PACKAGE_LINE_WIDTH, True))
-		fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, 1, fp.technology.thru_hole, fp.type.circle, -pad_distance / 2, 0, pad_diameter, pad_diameter, pad_drill))
-		fp.base.add(self, fp.pad(cfg.FOOTPRINT_THD_LAYERS, 2, fp.technology.thru_hole, fp.type.circle, pad_distance / 2, 0, pad_diameter, pad_diameter, pad_drill))
+		fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, 1, fp.technology.thru_hole, fp.type.circle, -pad_distance / 2, 0, pad_diameter, pad_diameter, pad_drill)
+		fp.base.add_pad(self, cfg.FOOTPRINT_THD_LAYERS, 2, fp.technology.thru_hole, fp.type.circle, pad_distance / 2, 0, pad_diameter, pad_diameter, pad_drill)
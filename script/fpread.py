@@ -0,0 +1,231 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Read footprint files in S-format back into fp elements and index a footprint tree
+
+import os
+import re
+import json
+import fnmatch
+import argparse
+import fp
+import atomicfile
+from fp import cfg
+
+tokenRe = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+padStartRe = re.compile(r'\(pad[\s)]')
+
+class quoted(str):
+    """Atom which was quoted in the file"""
+
+def atom(value):
+    """Atom as written to a footprint, quoted atoms keep their quotes"""
+    return '"%s"'%(value) if isinstance(value, quoted) else value
+
+def parse(text, start = 0):
+    """Parse one S-expression starting at index start. Returns (tree, end index).
+        Lists are python lists, atoms are strings. The parser is iterative, so nesting depth is not limited.
+    """
+    stack = []
+    tree = None
+    position = start
+    match = tokenRe.match
+    while True:
+        token = match(text, position)
+        if not token or token.end() == position:
+            raise Exception("Unexpected end of S-expression at %d"%(position))
+        position = token.end()
+        if token.group(1):
+            stack.append([])
+        elif token.group(2):
+            if not len(stack):
+                raise Exception("Unbalanced ')' at %d"%(position))
+            tree = stack.pop()
+            if not len(stack):
+                return (tree, position)
+            stack[-1].append(tree)
+        elif token.group(3) is not None:
+            if not len(stack):
+                return (quoted(token.group(3)), position)
+            stack[-1].append(quoted(token.group(3)))
+        else:
+            if not len(stack):
+                return (token.group(4), position)
+            stack[-1].append(token.group(4))
+
+def find(tree, name):
+    """First child list of tree starting with name, None if missing"""
+    for item in tree:
+        if isinstance(item, list) and len(item) and item[0] == name:
+            return item
+    return None
+
+def values(tree, name, default = None):
+    """Arguments of the first child list name of tree"""
+    item = find(tree, name)
+    return item[1:] if item else default
+
+def numbers(tree, name, count, default = 0.0):
+    """First count arguments of child list name as floats, missing ones are default"""
+    result = [float(value) for value in values(tree, name, [])[:count]]
+    return result + [default] * (count - len(result))
+
+def pad_arguments(item):
+    """Arguments of fp.pad/fp.base.add_pad of a pad list"""
+    x, y, angle = numbers(item, 'at', 3)
+    width, height = numbers(item, 'size', 2)
+    drill = values(item, 'drill', [])
+    # Oval drills are not supported by fp.pad, the first numeric size is used
+    drill = [float(value) for value in drill if value not in ("oval", )][:1]
+    return (" ".join(values(item, 'layers', [])), atom(item[1]), item[2], item[3], x, y, width, height, drill[0] if len(drill) else 0, angle)
+
+def read_pads(text):
+    """Pad table of a footprint text. Only the pad expressions are parsed, not the whole footprint."""
+    pads = fp.pad_table()
+    position = 0
+    while True:
+        match = padStartRe.search(text, position)
+        if not match:
+            break
+        item, position = parse(text, match.start())
+        pads.add(*pad_arguments(item))
+    return pads
+
+def to_footprint(tree):
+    """fp.base footprint of a parsed module expression"""
+    if not len(tree) or tree[0] != 'module':
+        raise Exception("Expression is not a module")
+
+    model = values(tree, 'model', [''])[0]
+    footprint = fp.base(tree[1], model, values(tree, 'descr', [''])[0], values(tree, 'tags', [''])[0], values(tree, 'attr', [''])[0] == 'smd', False)
+    tedit = values(tree, 'tedit')
+    if tedit:
+        footprint.tedit = int(tedit[0], 16)
+
+    for item in tree[2:]:
+        if not isinstance(item, list) or not len(item):
+            continue
+        kind = item[0]
+        layer = values(item, 'layer', [''])[0]
+        width = numbers(item, 'width', 1)[0]
+        if kind == 'fp_text':
+            x, y, angle = numbers(item, 'at', 3)
+            font = find(find(item, 'effects') or [], 'font') or []
+            size = numbers(font, 'size', 1)[0]
+            thickness = numbers(font, 'thickness', 1)[0]
+            footprint.add(fp.text(layer, item[1], atom(item[2]), x, y, angle, size, thickness))
+        elif kind == 'fp_line':
+            footprint.add(fp.line(layer, *(numbers(item, 'start', 2) + numbers(item, 'end', 2) + [width])))
+        elif kind == 'fp_arc':
+            footprint.add(fp.arc(layer, *(numbers(item, 'start', 2) + numbers(item, 'end', 2) + numbers(item, 'angle', 1) + [width])))
+        elif kind == 'fp_circle':
+            footprint.add(fp.circle(layer, *(numbers(item, 'center', 2) + numbers(item, 'end', 2) + [width])))
+        elif kind == 'pad':
+            footprint.add_pad(*pad_arguments(item))
+    return footprint
+
+def read(filename):
+    """fp.base footprint of a footprint file"""
+    with open(filename, "r") as file:
+        text = file.read()
+    return to_footprint(parse(text)[0])
+
+def bounding_box(footprint):
+    """Bounding box (x1, y1, x2, y2) in mm of pads and graphic elements, texts are ignored. None if empty."""
+    xs = []
+    ys = []
+    def add_element(element):
+        if isinstance(element, fp.group):
+            for child in element.elements:
+                add_element(child)
+        elif isinstance(element, fp.pad_table):
+            for x, y, width, height, angle in zip(element.x, element.y, element.width, element.height, element.angle):
+                if int(angle) % 180 == 90:
+                    width, height = height, width
+                xs.extend([x - width / 2, x + width / 2])
+                ys.extend([y - height / 2, y + height / 2])
+        elif isinstance(element, fp.circle):
+            radius = int(round(((element.x2 - element.x1) ** 2 + (element.y2 - element.y1) ** 2) ** 0.5))
+            xs.extend([element.x1 - radius, element.x1 + radius])
+            ys.extend([element.y1 - radius, element.y1 + radius])
+        elif isinstance(element, (fp.line, fp.arc)):
+            xs.extend([element.x1, element.x2])
+            ys.extend([element.y1, element.y2])
+    for element in footprint.elements:
+        add_element(element)
+    if not len(xs):
+        return None
+    return [fp.to_mm(min(xs)), fp.to_mm(min(ys)), fp.to_mm(max(xs)), fp.to_mm(max(ys))]
+
+def stamp(filename):
+    return [os.path.getsize(filename), os.path.getmtime(filename)]
+
+class footprint_index(object):
+    """Persistent index of name, pad count, bounding box and model of all footprints below root.
+        Only files changed since the last update are read again.
+    """
+
+    def __init__(self, root, index = None):
+        self.root = root
+        self.index = index if index else os.path.normpath(root) + ".index"
+        self.entries = {}
+        if os.path.isfile(self.index):
+            with open(self.index, "r") as file:
+                self.entries = json.load(file)
+        self.update()
+
+    def update(self):
+        """Read new and changed footprint files, drop removed ones and save the index if anything changed"""
+        entries = {}
+        changed = False
+        for path, dirs, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(cfg.FOOTPRINT_EXTENSION):
+                    continue
+                filename = os.path.join(path, name)
+                relative = os.path.relpath(filename, self.root)
+                current = stamp(filename)
+                entry = self.entries.get(relative)
+                if not entry or entry['stamp'] != current:
+                    footprint = read(filename)
+                    entry = {'stamp': current, 'name': footprint.name, 'pads': len(footprint.pads) if footprint.pads else 0,
+                        'bbox': bounding_box(footprint), 'model': footprint.model}
+                    changed = True
+                entries[relative] = entry
+
+        if changed or len(entries) != len(self.entries):
+            self.entries = entries
+            atomicfile.write(self.index, json.dumps(self.entries, sort_keys = True))
+        self.entries = entries
+
+    def search(self, pattern = "*", pads = None):
+        """Relative file names and entries of footprints matching a name pattern and optionally a pad count"""
+        return [(relative, entry) for relative, entry in sorted(self.entries.items())
+            if fnmatch.fnmatch(entry['name'], pattern) and (pads is None or entry['pads'] == pads)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Index and search footprint files.')
+    parser.add_argument('--root', type = str, help = 'Footprint directory (default: modules)', default = "modules")
+    parser.add_argument('--index', type = str, help = 'Index file (default: footprint directory with .index extension)')
+    parser.add_argument('--name', type = str, help = 'Footprint name pattern, e.g. soic_*', default = "*")
+    parser.add_argument('--pads', type = int, help = 'Number of pads')
+    args = parser.parse_args()
+
+    index = footprint_index(args.root, args.index)
+    for relative, entry in index.search(args.name, args.pads):
+        bbox = " ".join(["%.3f"%(value) for value in entry['bbox']]) if entry['bbox'] else "-"
+        print "%s %d (%s) %s"%(relative, entry['pads'], bbox, entry['model'])
@@ -0,0 +1,105 @@
+"""Directory listing module, which replaces per file stat calls by lookups in an in-memory index"""
+
+__all__ = ("DirectoryIndex", "load", "isfile", "invalidate", "refresh")
+
+import os
+
+def mtime(path):
+    """Modification time of a directory, None if missing"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+class DirectoryIndex(object):
+    """Set of all files below a root directory, listed once on creation.
+
+    Paths are stored relative to the root. A lower case map allows
+    case insensitive lookups, e.g. of 3D model names. Modification
+    times of all listed directories tell, if files were added or
+    removed since the index was created.
+
+    """
+
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        self.files = set()
+        self.folded = {}
+        self.stamps = {self.root: mtime(self.root)}
+        for path, dirs, files in os.walk(self.root):
+            dirs.sort()
+            self.stamps[path] = mtime(path)
+            relative = os.path.relpath(path, self.root)
+            for name in sorted(files):
+                name = os.path.normpath(os.path.join(relative, name))
+                self.files.add(name)
+                # First match in sorted order wins, if names only differ in case
+                self.folded.setdefault(name.lower(), name)
+
+    def stale(self):
+        """True if a file or directory was added or removed below the root since it was listed"""
+        for path, stamp in self.stamps.items():
+            if mtime(path) != stamp:
+                return True
+        return False
+
+    def __contains__(self, name):
+        return os.path.normpath(name) in self.files
+
+    def relative(self, path):
+        """Path relative to the root, None if path is not below the root"""
+        path = os.path.normpath(path)
+        if self.root == os.curdir:
+            return path if not os.path.isabs(path) and not path.startswith(os.pardir) else None
+        if path.startswith(self.root + os.sep):
+            return path[len(self.root) + 1:]
+        return None
+
+    def find(self, name, ignoreCase = False):
+        """Path of name relative to the root as stored on disk, None if missing"""
+        name = os.path.normpath(name)
+        if name in self.files:
+            return name
+        if ignoreCase:
+            return self.folded.get(name.lower())
+        return None
+
+    def isfile(self, path):
+        """Same as os.path.isfile, paths outside of the root are checked on disk"""
+        name = self.relative(path)
+        if name is None:
+            return os.path.isfile(path)
+        return name in self.files
+
+# Directory indexes, shared by all modules of one process
+indexes = {}
+
+def load(root):
+    """Return the index of root, it is listed again only if files were added or removed below root"""
+    root = os.path.normpath(root)
+    if root not in indexes or indexes[root].stale():
+        indexes[root] = DirectoryIndex(root)
+    return indexes[root]
+
+def invalidate(root = None):
+    """Drop the index of root or all indexes, they are listed again on next use"""
+    if root is None:
+        indexes.clear()
+    else:
+        indexes.pop(os.path.normpath(root), None)
+
+def refresh():
+    """Drop all indexes with files added or removed since they were listed, called once per build run"""
+    for root in [root for root, index in indexes.items() if index.stale()]:
+        del indexes[root]
+
+def isfile(path):
+    """os.path.isfile using an already loaded index containing path, otherwise the directory of path is listed.
+    Bare file names are checked on disk, instead of listing the whole working directory."""
+    if not os.path.dirname(path):
+        return os.path.isfile(path)
+    for index in indexes.values():
+        name = index.relative(path)
+        if name is not None:
+            return name in index.files
+    return load(os.path.dirname(path) or os.curdir).isfile(path)
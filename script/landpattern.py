@@ -0,0 +1,212 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Calculate IPC-7351 land patterns from package and lead dimensions.
+# Input is a csv table of one footprint family, output a csv table for footprint.py
+# with one row per package and density level. All rows are computed column wise.
+
+import sys
+import csv
+import math
+import argparse
+import traceback
+import config
+import atomicfile
+
+cfg = config.load("config")
+
+# Name suffix of each density level
+DENSITY_SUFFIX = {"most": "_m", "nominal": "_n", "least": "_l"}
+DENSITIES = ["most", "nominal", "least"]
+
+# Solder fillet goals (toe, heel, side) in mm of IPC-7351B
+GULLWING_GOALS = {"most": (0.55, 0.45, 0.05), "nominal": (0.35, 0.35, 0.03), "least": (0.15, 0.25, 0.01)}
+# Gull wing leads with pitch of 0.625 mm or less
+GULLWING_FINE_GOALS = {"most": (0.55, 0.45, 0.01), "nominal": (0.35, 0.35, -0.02), "least": (0.15, 0.25, -0.04)}
+GULLWING_FINE_PITCH = 0.625
+CHIP_GOALS = {"most": (0.55, -0.05, 0.05), "nominal": (0.35, -0.05, 0.0), "least": (0.15, -0.05, -0.05)}
+# Chips smaller than 1608 (0603)
+CHIP_SMALL_GOALS = {"most": (0.20, 0.0, 0.05), "nominal": (0.10, 0.0, 0.0), "least": (0.05, 0.0, 0.0)}
+CHIP_SMALL_LENGTH = 1.6
+# Through hole: drill above lead width, annular ring above FOOTPRINT_ANNULAR_RING, oval pad elongation
+THROUGH_HOLE_GOALS = {"most": (0.25, 0.10, 1.0), "nominal": (0.20, 0.05, 0.8), "least": (0.15, 0.0, 0.6)}
+
+# Output columns of each generator, in order of its arguments
+OUTPUT_COLUMNS = {
+    "soic": ["generator", "name", "description", "tags", "package_width", "package_height", "pad_width", "pad_height", "pad_grid", "pad_distance", "pad_count"],
+    "qfp": ["generator", "name", "description", "tags", "package_width", "package_height", "pad_width", "pad_height", "pad_grid", "pad_distance_x", "pad_distance_y", "pad_count_x", "pad_count_y"],
+    "chip": ["generator", "name", "description", "tags", "package_width", "package_height", "pad_width", "pad_height", "pad_distance"],
+    "dip": ["generator", "name", "description", "tags", "package_width", "package_height", "pad_width", "pad_height", "pad_grid", "pad_distance", "pad_count", "pad_drill"]
+}
+
+def round_up(values):
+    grid = cfg.FOOTPRINT_ROUND_OFF
+    return [math.ceil(value / grid - 1e-6) * grid for value in values]
+
+def round_down(values):
+    grid = cfg.FOOTPRINT_ROUND_OFF
+    return [math.floor(value / grid + 1e-6) * grid for value in values]
+
+def round_nearest(values):
+    grid = cfg.FOOTPRINT_ROUND_OFF
+    return [round(value / grid) * grid for value in values]
+
+def column(rows, key):
+    """Column of a table as list of floats"""
+    return [float(row[key]) for row in rows]
+
+def smd_lands(span_min, span_max, length_min, length_max, width_min, width_max, toe, heel, side):
+    """IPC-7351 land pattern of two opposing lead rows. All arguments are columns of equal length.
+        span - Outer lead span (toe to toe), length - lead/terminal length, width - lead/terminal width
+        toe, heel, side - Solder fillet goals
+        Returns columns of pad length, pad width and center to center pad distance.
+    """
+    f = cfg.FOOTPRINT_FABRICATION_TOLERANCE
+    p = cfg.FOOTPRINT_PLACEMENT_TOLERANCE
+    fp2 = f * f + p * p
+
+    span_tol = [b - a for a, b in zip(span_min, span_max)]
+    length_tol = [b - a for a, b in zip(length_min, length_max)]
+    width_tol = [b - a for a, b in zip(width_min, width_max)]
+
+    # Inner lead span with statistical (RMS) tolerance
+    inner_min = [a - 2 * b for a, b in zip(span_min, length_max)]
+    inner_max = [a - 2 * b for a, b in zip(span_max, length_min)]
+    inner_tol = [math.sqrt(a * a + 2 * b * b) for a, b in zip(span_tol, length_tol)]
+    inner_max = [b - ((b - a) - tol) / 2 for a, b, tol in zip(inner_min, inner_max, inner_tol)]
+
+    outer = round_up([a + 2 * j + math.sqrt(tol * tol + fp2) for a, j, tol in zip(span_min, toe, span_tol)])
+    inner = round_down([a - 2 * j - math.sqrt(tol * tol + fp2) for a, j, tol in zip(inner_max, heel, inner_tol)])
+    width = round_nearest([a + 2 * j + math.sqrt(tol * tol + fp2) for a, j, tol in zip(width_min, side, width_tol)])
+
+    return ([(z - g) / 2 for z, g in zip(outer, inner)], width, [(z + g) / 2 for z, g in zip(outer, inner)])
+
+def limit_width(width, pitch):
+    """Limit pad widths to keep the pad clearance to neighbouring pads"""
+    return [min(w, round_down([g - cfg.FOOTPRINT_PAD_CLEARANCE])[0]) for w, g in zip(width, pitch)]
+
+def gullwing(rows, density, span = "lead_span"):
+    pitch = column(rows, "pad_grid")
+    goals = [GULLWING_FINE_GOALS[density] if g <= GULLWING_FINE_PITCH else GULLWING_GOALS[density] for g in pitch]
+    toe, heel, side = zip(*goals)
+    length, width, distance = smd_lands(column(rows, span + "_min"), column(rows, span + "_max"), column(rows, "lead_length_min"), column(rows, "lead_length_max"),
+        column(rows, "lead_width_min"), column(rows, "lead_width_max"), toe, heel, side)
+    return length, limit_width(width, pitch), distance
+
+def soic_lands(rows, density):
+    length, width, distance = gullwing(rows, density)
+    return {"pad_width": width, "pad_height": length, "pad_distance": distance}
+
+def qfp_lands(rows, density):
+    length, width, distance_x = gullwing(rows, density, "lead_span_x")
+    length_y, width, distance_y = gullwing(rows, density, "lead_span_y")
+    # Both rows use the same pad size, so the larger pad length is used
+    return {"pad_width": width, "pad_height": [max(a, b) for a, b in zip(length, length_y)], "pad_distance_x": distance_x, "pad_distance_y": distance_y}
+
+def chip_goals(span_min, span_max, density):
+    """Fillet goals of chips, classified by nominal body length"""
+    return [CHIP_SMALL_GOALS[density] if (a + b) / 2 < CHIP_SMALL_LENGTH - 1e-6 else CHIP_GOALS[density] for a, b in zip(span_min, span_max)]
+
+def chip_lands(rows, density):
+    span_min = column(rows, "lead_span_min")
+    span_max = column(rows, "lead_span_max")
+    toe, heel, side = zip(*chip_goals(span_min, span_max, density))
+    length, width, distance = smd_lands(span_min, span_max, column(rows, "lead_length_min"), column(rows, "lead_length_max"),
+        column(rows, "lead_width_min"), column(rows, "lead_width_max"), toe, heel, side)
+    return {"pad_width": length, "pad_height": width, "pad_distance": distance}
+
+def dip_lands(rows, density):
+    drill_excess, ring_excess, elongation = THROUGH_HOLE_GOALS[density]
+    drills = sorted([float(drill) for drill in str(cfg.FOOTPRINT_DRILL).split()])
+
+    # Smallest available drill above the lead width plus excess, largest one if none is big enough
+    drill = []
+    for lead in column(rows, "lead_width_max"):
+        fitting = [d for d in drills if d >= lead + drill_excess - 1e-6]
+        drill.append(fitting[0] if len(fitting) else drills[-1])
+
+    width = round_up([d + 2 * (cfg.FOOTPRINT_ANNULAR_RING + ring_excess) for d in drill])
+    width = limit_width(width, column(rows, "pad_grid"))
+    span = [(a + b) / 2 for a, b in zip(column(rows, "lead_span_min"), column(rows, "lead_span_max"))]
+    return {"pad_width": width, "pad_height": [w + elongation for w in width], "pad_distance": span, "pad_drill": drill}
+
+calculators = {
+    "soic": soic_lands,
+    "qfp": qfp_lands,
+    "chip": chip_lands,
+    "dip": dip_lands
+}
+
+def read_table(csv_file):
+    """Rows of a land pattern table grouped by generator, keeping the order of first appearance"""
+    groups = []
+    with open(csv_file, 'rb') as csvfile:
+        for row in csv.DictReader(csvfile, delimiter=',', quotechar='\"'):
+            if row['generator'] not in calculators:
+                raise Exception("No land pattern calculator for generator '%s'"%(row['generator']))
+            if not len(groups) or groups[-1][0] != row['generator']:
+                groups.append((row['generator'], []))
+            groups[-1][1].append(row)
+    return groups
+
+def format_value(value):
+    if isinstance(value, float):
+        return "%.3f"%(value)
+    return value
+
+def calculate(csv_file, output_file, densities = DENSITIES):
+    """Write footprint table of all packages of csv_file in all given density levels"""
+    groups = read_table(csv_file)
+    if len(set([generator for generator, rows in groups])) > 1:
+        raise Exception("Footprint tables only support one generator")
+
+    output = []
+    header = None
+    for generator, rows in groups:
+        header = OUTPUT_COLUMNS[generator]
+        for density in densities:
+            lands = calculators[generator](rows, density)
+            for i, row in enumerate(rows):
+                data = dict(row)
+                data['name'] = row['name'] + DENSITY_SUFFIX[density]
+                data['description'] = row['description'] + ", IPC-7351 %s density"%(density)
+                for key in lands:
+                    data[key] = lands[key][i]
+                output.append([format_value(data[key]) for key in header])
+
+    # Density variants of one package are written next to each other
+    order = dict([(name, i) for i, name in enumerate([row['name'] for generator, rows in groups for row in rows])])
+    output.sort(key = lambda row: order[row[1][:-len(DENSITY_SUFFIX["most"])]])
+
+    with atomicfile.AtomicFile(output_file, 'wb') as csvfile:
+        table = csv.writer(csvfile, delimiter=',', quotechar='\"', lineterminator='\n')
+        if header:
+            table.writerow(header)
+        table.writerows(output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'IPC-7351 land pattern calculator for footprint tables.')
+    parser.add_argument('--csv', type = str, help = 'CSV table of package and lead dimensions', required = True)
+    parser.add_argument('--output', type = str, help = 'Footprint table for footprint.py', required = True)
+    parser.add_argument('--density', nargs = '+', choices = DENSITIES, help = 'Density levels (default: all)', default = DENSITIES)
+    args = parser.parse_args()
+
+    try:
+        calculate(args.csv, args.output, args.density)
+    except Exception as e:
+        traceback.print_exc()
+        sys.exit(2)
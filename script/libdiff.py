@@ -0,0 +1,235 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Semantic diff of two builds of symbol libraries (.lib/.dcm) and footprints (.kicad_mod).
+# Symbols, descriptions and footprints are compared by hash of their normalized text,
+# only changed parts are compared line by line.
+
+import os
+import re
+import sys
+import hashlib
+import argparse
+from libmerge import readSymbols, readDescriptions
+
+teditRe = re.compile(r'\(tedit [0-9A-Fa-f]+\)')
+padNameRe = re.compile(r'^\(pad (\S+)')
+textNameRe = re.compile(r'^\(fp_text (\S+)')
+
+EXTENSIONS = [".lib", ".dcm", ".kicad_mod"]
+
+def normalize(block):
+    """Lines of a block without comments, surrounding whitespace and edit timestamp"""
+    return [teditRe.sub("", line).strip() for line in block.splitlines() if not line.startswith("#") and len(line.strip())]
+
+def normalizeFootprint(text):
+    """Normalized lines of a footprint, where every element spanning multiple lines is joined into one"""
+    result = []
+    depth = 0
+    for line in normalize(text):
+        # Lines starting within an element below the module continue it
+        if depth > 1 and len(result):
+            result[-1] += " " + line
+        else:
+            result.append(line)
+        quoted = False
+        for char in line:
+            if char == '"':
+                quoted = not quoted
+            elif not quoted:
+                if char == '(':
+                    depth += 1
+                elif char == ')':
+                    depth -= 1
+    return result
+
+def digest(lines):
+    return hashlib.md5("\n".join(lines)).hexdigest()
+
+def symbolKey(line):
+    """Symbol lines are compared by field number, all other lines by content"""
+    if line.startswith("F") and " " in line:
+        return line.split(" ", 1)[0]
+    return None
+
+def footprintKey(line):
+    """Footprint lines are compared by pad name and text name, all other lines by content"""
+    match = padNameRe.match(line) or textNameRe.match(line)
+    if match:
+        return line.split(" ", 1)[0][1:] + " " + match.group(1)
+    return None
+
+def descriptionKey(line):
+    return line.split(" ", 1)[0]
+
+def lineDiff(old, new, key):
+    """Field level differences of two normalized blocks, lines with the same key are reported as changed"""
+    result = []
+    oldKeyed = {}
+    newKeyed = {}
+    oldOther = []
+    newOther = []
+    for lines, keyed, other in [(old, oldKeyed, oldOther), (new, newKeyed, newOther)]:
+        for line in lines:
+            name = key(line)
+            if name and name not in keyed:
+                keyed[name] = line
+            else:
+                other.append(line)
+
+    for name in sorted(set(oldKeyed) | set(newKeyed)):
+        if name not in newKeyed:
+            result.append("- " + oldKeyed[name])
+        elif name not in oldKeyed:
+            result.append("+ " + newKeyed[name])
+        elif oldKeyed[name] != newKeyed[name]:
+            result.append("%s: %s -> %s"%(name, oldKeyed[name], newKeyed[name]))
+
+    # Remaining lines as multiset difference, keeping their order
+    counts = {}
+    for line in newOther:
+        counts[line] = counts.get(line, 0) + 1
+    for line in oldOther:
+        if counts.get(line, 0):
+            counts[line] -= 1
+        else:
+            result.append("- " + line)
+    counts = {}
+    for line in oldOther:
+        counts[line] = counts.get(line, 0) + 1
+    for line in newOther:
+        if counts.get(line, 0):
+            counts[line] -= 1
+        else:
+            result.append("+ " + line)
+    return result
+
+def readParts(filename):
+    """Dict of part name -> normalized lines and dict of alias name -> root symbol name of a library, description or footprint file"""
+    extension = os.path.splitext(filename)[1]
+    if extension == ".lib":
+        parts = {}
+        roots = {}
+        for name, aliases, block in readSymbols(filename):
+            parts[name] = normalize(block)
+            for alias in aliases:
+                roots[alias] = name
+        return (parts, roots)
+    if extension == ".dcm":
+        return (dict([(name, normalize(block)) for name, block in readDescriptions(filename)]), {})
+    with open(filename, "r") as file:
+        return ({os.path.splitext(os.path.basename(filename))[0]: normalizeFootprint(file.read())}, {})
+
+def listFiles(path):
+    """Dict of relative path -> path of all library and footprint files of a file or directory"""
+    if not os.path.isdir(path):
+        return {os.path.basename(path): path}
+    result = {}
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            if os.path.splitext(name)[1] in EXTENSIONS:
+                filename = os.path.join(root, name)
+                result[os.path.relpath(filename, path)] = filename
+    return result
+
+class difference(object):
+    """Added, removed and changed parts of one file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.added = []
+        self.removed = []
+        # List of (name, root symbol) of symbols, which became an alias of root or the other way round
+        self.moved_to_alias = []
+        self.moved_from_alias = []
+        # List of (name, field differences)
+        self.changed = []
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.moved_to_alias) + len(self.moved_from_alias) + len(self.changed)
+
+def compareFiles(relative, old, new, fields = True):
+    """Compare one file of both builds, old or new may be None if the file is missing"""
+    result = difference(relative)
+    oldParts, oldRoots = readParts(old) if old else ({}, {})
+    newParts, newRoots = readParts(new) if new else ({}, {})
+    extension = os.path.splitext(relative)[1]
+    key = {".lib": symbolKey, ".dcm": descriptionKey}.get(extension, footprintKey)
+
+    for name in sorted(set(oldParts) | set(newParts)):
+        if name not in newParts:
+            if name in newRoots:
+                result.moved_to_alias.append((name, newRoots[name]))
+            else:
+                result.removed.append(name)
+        elif name not in oldParts:
+            if name in oldRoots:
+                result.moved_from_alias.append((name, oldRoots[name]))
+            else:
+                result.added.append(name)
+        elif digest(oldParts[name]) != digest(newParts[name]):
+            result.changed.append((name, lineDiff(oldParts[name], newParts[name], key) if fields else []))
+    return result
+
+def compare(old_path, new_path, fields = True):
+    """Compare two builds (files or directories). Returns a list of differences of all files with differences"""
+    if not os.path.isdir(old_path) and not os.path.isdir(new_path):
+        diff = compareFiles(os.path.basename(new_path), old_path, new_path, fields)
+        return [diff] if len(diff) else []
+
+    oldFiles = listFiles(old_path)
+    newFiles = listFiles(new_path)
+    result = []
+    for relative in sorted(set(oldFiles) | set(newFiles)):
+        diff = compareFiles(relative, oldFiles.get(relative), newFiles.get(relative), fields)
+        if len(diff):
+            result.append(diff)
+    return result
+
+def report(differences, stream):
+    total = [0, 0, 0, 0]
+    for diff in differences:
+        moved = len(diff.moved_to_alias) + len(diff.moved_from_alias)
+        stream.write("%s: %d added, %d removed, %d moved, %d changed\n"%(diff.filename, len(diff.added), len(diff.removed), moved, len(diff.changed)))
+        for name in diff.added:
+            stream.write("  + %s\n"%(name))
+        for name in diff.removed:
+            stream.write("  - %s\n"%(name))
+        for name, root in diff.moved_to_alias:
+            stream.write("  > %s: moved to alias of %s\n"%(name, root))
+        for name, root in diff.moved_from_alias:
+            stream.write("  < %s: moved from alias of %s\n"%(name, root))
+        for name, lines in diff.changed:
+            stream.write("  ~ %s\n"%(name))
+            for line in lines:
+                stream.write("      %s\n"%(line))
+        total[0] += len(diff.added)
+        total[1] += len(diff.removed)
+        total[2] += moved
+        total[3] += len(diff.changed)
+    stream.write("Total: %d added, %d removed, %d moved, %d changed\n"%tuple(total))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Semantic diff of two builds of symbol libraries and footprints.')
+    parser.add_argument('old', type = str, help = 'Library file or directory of the old build')
+    parser.add_argument('new', type = str, help = 'Library file or directory of the new build')
+    parser.add_argument('--brief', action = 'store_true', help = 'Only list names of changed parts')
+    args = parser.parse_args()
+
+    differences = compare(args.old, args.new, not args.brief)
+    report(differences, sys.stdout)
+    sys.exit(1 if len(differences) else 0)
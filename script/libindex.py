@@ -0,0 +1,170 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Byte offset index for generated symbol libraries (.lib) and descriptions (.dcm).
+# The index is stored next to the library and symbols are read with mmap.
+
+import os
+import sys
+import re
+import mmap
+import json
+import atomicfile
+import argparse
+
+defRe = re.compile(r'^DEF +(\S+) ', re.M)
+enddefRe = re.compile(r'^ENDDEF\s*?$\n?', re.M)
+aliasRe = re.compile(r'^ALIAS +(.*)$', re.M)
+cmpRe = re.compile(r'^\$CMP +(\S+)', re.M)
+endcmpRe = re.compile(r'^\$ENDCMP\s*?$\n?', re.M)
+
+def stamp(filename):
+    """Size and modification time of a file, None if missing"""
+    if not os.path.isfile(filename):
+        return None
+    return [os.path.getsize(filename), os.path.getmtime(filename)]
+
+def openMap(filename):
+    """Read only memory map of a file, None if file is missing or empty"""
+    if not os.path.isfile(filename) or not os.path.getsize(filename):
+        return None
+    with open(filename, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+def scanSymbols(data):
+    """Returns a list of (name, start, end) for every DEF ... ENDDEF block. Aliases share the block of their symbol"""
+    result = []
+    for match in defRe.finditer(data):
+        end = enddefRe.search(data, match.end())
+        if not end:
+            raise Exception("Missing ENDDEF of symbol '%s'"%(match.group(1)))
+        result.append((match.group(1), match.start(), end.end()))
+        alias = aliasRe.search(data, match.end(), end.start())
+        if alias:
+            for name in alias.group(1).split():
+                result.append((name, match.start(), end.end()))
+    return result
+
+def scanDescriptions(data):
+    """Returns a list of (name, start, end) for every $CMP ... $ENDCMP block"""
+    result = []
+    for match in cmpRe.finditer(data):
+        end = endcmpRe.search(data, match.end())
+        if not end:
+            raise Exception("Missing $ENDCMP of description '%s'"%(match.group(1)))
+        result.append((match.group(1), match.start(), end.end()))
+    return result
+
+class LibraryIndex(object):
+    """Index of symbol and description blocks of a library. Use symbol() and description() for random access."""
+
+    def __init__(self, lib, dcm = None, index = None):
+        self.lib = lib
+        self.dcm = dcm if dcm else os.path.splitext(lib)[0] + ".dcm"
+        self.index = index if index else os.path.splitext(lib)[0] + ".index"
+        self.symbols = {}
+        self.descriptions = {}
+        self.libMap = None
+        self.dcmMap = None
+
+        if not self.load():
+            self.scan()
+            self.save()
+
+    def load(self):
+        """Load index file. Returns False, if it is missing or outdated"""
+        if not os.path.isfile(self.index):
+            return False
+
+        with open(self.index, "r") as file:
+            data = json.load(file)
+        if data['lib'] != stamp(self.lib) or data['dcm'] != stamp(self.dcm):
+            return False
+
+        self.symbols = data['symbols']
+        self.descriptions = data['descriptions']
+        return True
+
+    def save(self):
+        atomicfile.write(self.index, json.dumps({'lib': stamp(self.lib), 'dcm': stamp(self.dcm), 'symbols': self.symbols, 'descriptions': self.descriptions}))
+
+    def scan(self):
+        """Scan library and description file once for block offsets"""
+        self.close()
+        self.symbols = {}
+        self.descriptions = {}
+
+        data = openMap(self.lib)
+        if data:
+            for name, start, end in scanSymbols(data):
+                self.symbols[name] = [start, end]
+            data.close()
+
+        data = openMap(self.dcm)
+        if data:
+            for name, start, end in scanDescriptions(data):
+                self.descriptions[name] = [start, end]
+            data.close()
+
+    def names(self):
+        """Names of all symbols and aliases"""
+        return self.symbols.keys()
+
+    def symbol(self, name):
+        """DEF ... ENDDEF block of a symbol or alias"""
+        if name not in self.symbols:
+            raise Exception("Symbol '%s' not found in '%s'"%(name, self.lib))
+        if not self.libMap:
+            self.libMap = openMap(self.lib)
+        start, end = self.symbols[name]
+        return self.libMap[start:end]
+
+    def description(self, name):
+        """$CMP ... $ENDCMP block of a symbol or alias, empty if not described"""
+        if name not in self.descriptions:
+            return ""
+        if not self.dcmMap:
+            self.dcmMap = openMap(self.dcm)
+        start, end = self.descriptions[name]
+        return self.dcmMap[start:end]
+
+    def close(self):
+        if self.libMap:
+            self.libMap.close()
+            self.libMap = None
+        if self.dcmMap:
+            self.dcmMap.close()
+            self.dcmMap = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Index a symbol library and print symbols from it.')
+    parser.add_argument('--lib', type = str, help = 'KiCAD symbol library', required = True)
+    parser.add_argument('--desc', type = str, help = 'KiCAD symbol description file (default: library with .dcm extension)')
+    parser.add_argument('--index', type = str, help = 'Index file (default: library with .index extension)')
+    parser.add_argument('--name', nargs = '*', type = str, help = 'Print symbol and description of given names', default = [])
+    args = parser.parse_args()
+
+    index = LibraryIndex(args.lib, args.desc, args.index)
+    missing = 0
+    for name in args.name:
+        if name in index.symbols:
+            print index.symbol(name) + index.description(name)
+        else:
+            sys.stderr.write("Symbol '%s' not found in '%s'\n"%(name, args.lib))
+            missing += 1
+    index.close()
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2015 Benjamin Fueldner
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+#
+# Merge partial symbol libraries (.lib) and descriptions (.dcm) into one library.
+# Inputs have to be in natural order of symbol names (device.py --sort). The merge
+# is streamed, only one symbol block per input is held in memory.
+
+import os
+import sys
+import heapq
+import argparse
+import traceback
+import atomicfile
+from device import SYMBOL_HEADER, SYMBOL_FOOTER, DESC_HEADER, DESC_FOOTER
+from summary import natural_key
+
+def readSymbols(filename):
+    """Yields (name, aliases, block) for every symbol of a library, block includes the comment header"""
+    with open(filename, "r") as file:
+        comment = []
+        block = None
+        for line in file:
+            if block is not None:
+                block.append(line)
+                if line.startswith("ALIAS "):
+                    aliases = line.split()[1:]
+                elif line.rstrip("\r\n") == "ENDDEF":
+                    yield (name, aliases, "".join(block))
+                    block = None
+            elif line.startswith("DEF "):
+                name = line.split()[1]
+                aliases = []
+                block = comment + [line]
+                comment = []
+            elif line.startswith("#") and not line.startswith("#encoding"):
+                comment.append(line)
+            else:
+                comment = []
+        if block is not None:
+            raise Exception("Missing ENDDEF of symbol '%s' in '%s'"%(name, filename))
+
+def readDescriptions(filename):
+    """Yields (name, block) for every $CMP block of a description file, block includes the leading comment"""
+    if not os.path.isfile(filename):
+        return
+    with open(filename, "r") as file:
+        comment = []
+        block = None
+        for line in file:
+            if block is not None:
+                block.append(line)
+                if line.rstrip("\r\n") == "$ENDCMP":
+                    yield (name, "".join(block))
+                    block = None
+            elif line.startswith("$CMP "):
+                name = line.split()[1]
+                block = comment + [line]
+                comment = []
+            elif line.startswith("#"):
+                comment.append(line)
+            else:
+                comment = []
+        if block is not None:
+            raise Exception("Missing $ENDCMP of description '%s' in '%s'"%(name, filename))
+
+class source(object):
+    """One partial library with its description file. Descriptions follow the order of the symbols."""
+
+    def __init__(self, lib, dcm):
+        self.lib = lib
+        self.symbols = readSymbols(lib)
+        self.descriptions = readDescriptions(dcm)
+        self.description = next(self.descriptions, None)
+
+    def next(self):
+        """Next (name, aliases, block) or None at the end of the library"""
+        return next(self.symbols, None)
+
+    def take_descriptions(self, names):
+        """Description blocks of names, which are next in the description file"""
+        result = []
+        while self.description and self.description[0] in names:
+            result.append(self.description[1])
+            self.description = next(self.descriptions, None)
+        return result
+
+def merge(libs, symbol_file, desc_file, dcms = None):
+    """Merge libs (and their .dcm files) in natural order of symbol names. Duplicate names are rejected.
+        Outputs are renamed into place on success, on error previous outputs are kept unchanged.
+    """
+    if not dcms:
+        dcms = [os.path.splitext(lib)[0] + ".dcm" for lib in libs]
+
+    symbol_output = None
+    desc_output = None
+    try:
+        symbol_output = atomicfile.AtomicFile(symbol_file)
+        desc_output = atomicfile.AtomicFile(desc_file)
+        symbol_output.write(SYMBOL_HEADER)
+        desc_output.write(DESC_HEADER)
+
+        sources = [source(lib, dcm) for lib, dcm in zip(libs, dcms)]
+        heap = []
+        for index, input in enumerate(sources):
+            symbol = input.next()
+            if symbol:
+                heap.append((natural_key(symbol[0]), index, symbol))
+        heapq.heapify(heap)
+
+        # Names are kept to detect duplicate aliases, which are not in sorted order
+        names = set()
+        while len(heap):
+            key, index, (name, aliases, block) = heapq.heappop(heap)
+            for alias in [name] + aliases:
+                if alias in names:
+                    raise Exception("Duplicate symbol '%s' in '%s'"%(alias, libs[index]))
+                names.add(alias)
+
+            symbol_output.write(block)
+            desc_output.write("".join(sources[index].take_descriptions(set([name] + aliases))))
+
+            symbol = sources[index].next()
+            if symbol:
+                next_key = natural_key(symbol[0])
+                if next_key < key:
+                    raise Exception("Symbol '%s' in '%s' is not in natural order"%(symbol[0], libs[index]))
+                heapq.heappush(heap, (next_key, index, symbol))
+
+        for input in sources:
+            if input.description:
+                raise Exception("Description '%s' without symbol or out of symbol order in '%s'"%(input.description[0], input.lib))
+
+        symbol_output.write(SYMBOL_FOOTER)
+        symbol_output.close()
+        desc_output.write(DESC_FOOTER)
+        desc_output.close()
+    except:
+        for output in [symbol_output, desc_output]:
+            if output:
+                output.discard()
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Merge partial symbol libraries in natural order of symbol names.')
+    parser.add_argument('--libs', nargs = '+', type = str, help = 'Partial symbol libraries, descriptions are taken from .dcm files of equal name', required = True)
+    parser.add_argument('--symbol', type = str, help = 'Output file for merged KiCAD symbols', required = True)
+    parser.add_argument('--desc', type = str, help = 'Output file for merged KiCAD symbol descriptions', required = True)
+    args = parser.parse_args()
+
+    try:
+        merge(args.libs, args.symbol, args.desc)
+    except Exception as e:
+        traceback.print_exc()
+        sys.exit(2)
@@ -18,31 +18,26 @@
 # Generate footprint files from csv table
 
 import os
+import atomicfile
 import ConfigParser
 import StringIO
 import argparse
 import datetime
 import locale
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description = 'Project file generation.')
-    parser.add_argument('--template', metavar = 'template', type = str, help = 'Project template input file', required = True)
-    parser.add_argument('--project', metavar = 'project', type = str, help = 'Output project file', required = True)
-    parser.add_argument('--symbol_path', metavar = 'symbol_path', type = str, help = 'Symbol path', required = True)
-    parser.add_argument('--footprint_path', metavar = 'footprint_path', type = str, help = 'Footprint path', required = True)
-    args = parser.parse_args()
-
+def generate(template, project_file, symbol_path, footprint_path):
+    """Generate project file from template, listing all symbol libraries in symbol_path and footprint libraries in footprint_path"""
     home_path = os.path.expanduser("~")
     kicad_path = os.path.join(home_path, 'kicad')
     if kicad_path != os.getcwd():
         print "WARNING: Library is not in searchpath of KiCAD '%s'. Templates do not work!"%(kicad_path)
 
-    file = open(args.template, "r")
+    file = open(template, "r")
     data = file.read()
     file.close()
 
-    args.symbol_path = os.path.abspath(args.symbol_path)
-    args.footprint_path = os.path.abspath(args.footprint_path)
+    symbol_path = os.path.abspath(symbol_path)
+    footprint_path = os.path.abspath(footprint_path)
 
     # KiCAD project file is in INI format, but the first section is missing!
     data = '[hidden]\n' + data
@@ -60,12 +55,18 @@ if __name__ == "__main__":
     # Symbol libs
     project.remove_section('eeschema/libraries')
     project.add_section('eeschema/libraries')
-    project.set('eeschema', 'libdir', args.symbol_path.replace(home_path, '~'))
+    project.set('eeschema', 'libdir', symbol_path.replace(home_path, '~'))
 
+    # Sharded libraries (device.py --shard) are registered by their shards instead of the whole library
     libs = []
-    for file in os.listdir(args.symbol_path):
-        if os.path.isfile(os.path.join(args.symbol_path, file)) and file.endswith(".lib"):
-            libs.append(os.path.splitext(file)[0])
+    for file in os.listdir(symbol_path):
+        if os.path.isfile(os.path.join(symbol_path, file)) and file.endswith(".lib"):
+            name = os.path.splitext(file)[0]
+            shard_path = os.path.join(symbol_path, name)
+            shards = []
+            if os.path.isdir(shard_path):
+                shards = [name + "/" + os.path.splitext(shard)[0] for shard in os.listdir(shard_path) if shard.endswith(".lib")]
+            libs.extend(shards if len(shards) else [name])
     libs.sort()
 
     index = 1
@@ -76,11 +77,11 @@ if __name__ == "__main__":
     # Footprint libs
     project.remove_section('pcbnew/libraries')
     project.add_section('pcbnew/libraries')
-    project.set('pcbnew/libraries', 'libdir', args.footprint_path.replace(home_path, '~'))
+    project.set('pcbnew/libraries', 'libdir', footprint_path.replace(home_path, '~'))
 
     libs = []
-    for file in os.listdir(args.footprint_path):
-        if os.path.isdir(os.path.join(args.footprint_path, file)):
+    for file in os.listdir(footprint_path):
+        if os.path.isdir(os.path.join(footprint_path, file)):
             libs.append(file)
     libs.sort()
 
@@ -95,6 +96,14 @@ if __name__ == "__main__":
     data = buffer.getvalue()
     data = data.replace("[hidden]\n", "")
 
-    file = open(args.project, "w")
-    file.write(data)
-    file.close()
+    atomicfile.write(project_file, data)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Project file generation.')
+    parser.add_argument('--template', metavar = 'template', type = str, help = 'Project template input file', required = True)
+    parser.add_argument('--project', metavar = 'project', type = str, help = 'Output project file', required = True)
+    parser.add_argument('--symbol_path', metavar = 'symbol_path', type = str, help = 'Symbol path', required = True)
+    parser.add_argument('--footprint_path', metavar = 'footprint_path', type = str, help = 'Footprint path', required = True)
+    args = parser.parse_args()
+
+    generate(args.template, args.project, args.symbol_path, args.footprint_path)
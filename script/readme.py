@@ -18,17 +18,14 @@
 # Generate readme.md file containing library configuration
 
 import config
+import atomicfile
 
-cfg = config.Config("config")
+cfg = config.load("config")
 
-if __name__ == "__main__":
-    import argparse
-    parser = argparse.ArgumentParser(description='Generate a readme file in markdown syntac containing library configuration.')
-    parser.add_argument('--output', metavar = 'out', type = str, help = 'Output file', required = True)
-    args = parser.parse_args()
-
-    output = open(args.output, "w")
-    output.write("""# kicad
+def generate(output_file):
+    """Write readme file containing library configuration to output_file"""
+    with atomicfile.AtomicFile(output_file) as output:
+        output.write("""# kicad
 KiCad library used in our projects. Main parts are generated using python scripts and input data from csv tables. This should give a very flexible base to add new symbols, footprings and parts.
 
 All dimension are in millimeters/degree, if not otherwise noted.
@@ -50,45 +47,51 @@ For multiple devices with following numbers (BC546, BC547, BC548, BC549, BC550):
     BC546_550.pdf
 """)
 
-    output.write("## Symbol\n")
+        output.write("## Symbol\n")
 
-    output.write("\n### Configuration\n\n")
+        output.write("\n### Configuration\n\n")
 
-    output.write("F#-Field usage:\n")
-    # This entries are reverse, so we make a little map
-    map = {}
-    for value in cfg.dict():
-        part = value.split("_", 1)
-        if len(part) == 2 and part[1] == 'FIELD':
-            map[int(getattr(cfg, value))] = getattr(cfg, part[0]+"_NAME")
+        output.write("F#-Field usage:\n")
+        # This entries are reverse, so we make a little map
+        map = {}
+        for value in cfg.dict():
+            part = value.split("_", 1)
+            if len(part) == 2 and part[1] == 'FIELD':
+                map[int(getattr(cfg, value))] = getattr(cfg, part[0]+"_NAME")
 
-    for key in sorted(map):
-        output.write("* **F%d**: %s\n"%(key, map[key]))
+        for key in sorted(map):
+            output.write("* **F%d**: %s\n"%(key, map[key]))
 
-    map = {}
-    for value in cfg.dict():
-        part = value.split("_", 1)
-        if len(part) == 2 and part[0] == 'SYMBOL':
-            map[value] = getattr(cfg, value)
+        map = {}
+        for value in cfg.dict():
+            part = value.split("_", 1)
+            if len(part) == 2 and part[0] == 'SYMBOL':
+                map[value] = getattr(cfg, value)
 
-    for key in sorted(map):
-        output.write("* **%s**: %s\n"%(key, map[key]))
+        for key in sorted(map):
+            output.write("* **%s**: %s\n"%(key, map[key]))
 
-    output.write("\n### Generators\n\n")
+        output.write("\n### Generators\n\n")
 
-    output.write("\n## Footprint\n\n")
+        output.write("\n## Footprint\n\n")
 
-    output.write("\n### Configuration\n\n")
+        output.write("\n### Configuration\n\n")
 
-    map = {}
-    for value in cfg.dict():
-        part = value.split("_", 1)
-        if len(part) == 2 and part[0] == 'FOOTPRINT':
-            map[value] = getattr(cfg, value)
+        map = {}
+        for value in cfg.dict():
+            part = value.split("_", 1)
+            if len(part) == 2 and part[0] == 'FOOTPRINT':
+                map[value] = getattr(cfg, value)
 
-    for key in sorted(map):
-        output.write("* **%s**: %s\n"%(key, map[key]))
+        for key in sorted(map):
+            output.write("* **%s**: %s\n"%(key, map[key]))
 
-    output.write("\n### Generators\n\n")
+        output.write("\n### Generators\n\n")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate a readme file in markdown syntac containing library configuration.')
+    parser.add_argument('--output', metavar = 'out', type = str, help = 'Output file', required = True)
+    args = parser.parse_args()
 
-    output.close()
+    generate(args.output)
@@ -37,6 +37,7 @@
 
 
 import csv
+import atomicfile
 import re
 import string
 from string import split
@@ -91,16 +92,16 @@ if __name__ == "__main__":
     parser.add_argument('--output', metavar='out', type=str,
             help='the kicad library output file', required=True)
     args = parser.parse_args()
-    output = open(args.output, "w")
-    output.write("EESchema-LIBRARY Version 2.3\n")
-
-
-    if args.grouped != None:
-        for src in args.grouped:
-            MakeMultiSymbol(src, output)
-    if args.single != None:
-        for src in args.single:
-            MakeSingleSymbol(src, output)
-    if args.clock != None:
-        for src in args.clock:
-            MakeRoundClockSymbol(src, output)
+    with atomicfile.AtomicFile(args.output) as output:
+        output.write("EESchema-LIBRARY Version 2.3\n")
+
+
+        if args.grouped != None:
+            for src in args.grouped:
+                MakeMultiSymbol(src, output)
+        if args.single != None:
+            for src in args.single:
+                MakeSingleSymbol(src, output)
+        if args.clock != None:
+            for src in args.clock:
+                MakeRoundClockSymbol(src, output)
@@ -20,15 +20,51 @@
 import re
 import os
 import config
-cfg = config.Config("config")
+import atomicfile
+cfg = config.load("config")
 
 symbolNameRe = re.compile('F1 +"([^"]+)"')
 packageNameRe = re.compile('  \(descr +"([^"]+)"\)')
 
-def natural_sort(l):
+def natural_key(key):
     convert = lambda text: int(text) if text.isdigit() else text.lower()
-    alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
-    return sorted(l, key=alphanum_key)
+    return [convert(c) for c in re.split('([0-9]+)', key)]
+
+def natural_sort(l):
+    return sorted(l, key=natural_key)
+
+def generate(libs, footprints, output_file):
+    """Write names of all symbols in libs and descriptions of all footprints in the footprints directories to output_file"""
+    with atomicfile.AtomicFile(output_file) as output:
+        output.write("Symbol summary\n")
+        if libs != None:
+            for src in libs:
+                output.write("---------------------------------\n")
+                output.write("Library file : %s\n"%(src))
+                output.write("---------------------------------\n")
+                ifile = open(src,"r")
+                data = ifile.read()
+                ifile.close()
+                for match in symbolNameRe.finditer(data):
+                    output.write(match.group(1)+"\n")
+
+        if footprints != None:
+            for src in footprints:
+                output.write("---------------------------------\n")
+                output.write("Footprint section '%s'\n"%(src))
+                output.write("---------------------------------\n")
+
+                list = os.listdir(src)
+                list = natural_sort(list)
+                for file in list:
+                    if file.endswith(cfg.FOOTPRINT_EXTENSION):
+                        print(file)
+
+                        ifile = open(src+'/'+file, "r")
+                        data = ifile.read()
+                        ifile.close()
+                        for match in packageNameRe.finditer(data):
+                            output.write(match.group(1)+"\n")
 
 if __name__ == "__main__":
 
@@ -41,34 +77,5 @@ if __name__ == "__main__":
     parser.add_argument('--output', metavar='out', type=str,
             help='the file containing the summary', required=True)
     args = parser.parse_args()
-    output = open(args.output, "w")
-
-    output.write("Symbol summary\n")
-    if args.libs != None:
-        for src in args.libs:
-            output.write("---------------------------------\n")
-            output.write("Library file : %s\n"%(src))
-            output.write("---------------------------------\n")
-            ifile = open(src,"r")
-            data = ifile.read()
-            ifile.close()
-            for match in symbolNameRe.finditer(data):
-                output.write(match.group(1)+"\n")
-
-    if args.footprints != None:
-        for src in args.footprints:
-            output.write("---------------------------------\n")
-            output.write("Footprint section '%s'\n"%(src))
-            output.write("---------------------------------\n")
-
-            list = os.listdir(src)
-            list = natural_sort(list)
-            for file in list:
-                if file.endswith(cfg.FOOTPRINT_EXTENSION):
-                    print(file)
 
-                    ifile = open(src+'/'+file, "r")
-                    data = ifile.read()
-                    ifile.close()
-                    for match in packageNameRe.finditer(data):
-                        output.write(match.group(1)+"\n")
+    generate(args.libs, args.footprints, args.output)
@@ -24,9 +24,11 @@ import csv
 import StringIO
 import itertools
 import math
+import os
+import copy
 
 # Load the configuration file and provide it's values through the cfg object
-cfg = config.Config("config")
+cfg = config.load("config")
 
 class fill():
     none = "N"
@@ -121,12 +123,15 @@ class shape():
 class Field(object):
     """Symbol field"""
 
+    __slots__ = ('id', 'value', 'x', 'y', 'size', 'orientation', 'visibility', 'hjustify', 'vjustify', 'style', 'comment')
+
     Format = "F%d \"%s\" %d %d %d %s %s %s %s%s \"%s\""
     Map = {}
-    for value in cfg.dict():
-        part = value.split("_", 1)
+    for name in cfg.dict():
+        part = name.split("_", 1)
         if len(part) == 2 and part[1] == 'FIELD':
-            Map[int(getattr(cfg, value))] = getattr(cfg, part[0]+"_NAME")
+            Map[int(getattr(cfg, name))] = getattr(cfg, part[0]+"_NAME")
+    del name, part
 
     def __init__(self, id, value, x, y, size, orientation = orientation.horizontal, visibility = visibility.visible, hjustify = hjustify.center, vjustify = vjustify.center, style = style.none):
         self.id = id
@@ -150,6 +155,8 @@ class Field(object):
 class Point(object):
     "Represents a point"
 
+    __slots__ = ('x', 'y')
+
     Format = "%d %d"
 
     def __init__(self, x, y):
@@ -163,12 +170,18 @@ class Point(object):
 
         return self.x == rhs.x and self.y == rhs.y
 
+    def key(self):
+        """Canonical geometry key"""
+        return (self.x, self.y)
+
     def render(self):
         return Point.Format%(self.x, self.y)
 
 class Item(object):
     "Base item for graphical symbol elements"
 
+    __slots__ = ('unit', 'representation', 'prio')
+
     def __init__(self, unit = 0, representation = representation.normal, prio = 0):
         self.unit = unit
         self.representation = representation
@@ -177,9 +190,19 @@ class Item(object):
     def priority(self):
         return self.unit * 65536 + self.prio * 256
 
+    def key(self):
+        """Canonical geometry key, items with the same key are compared with equal(). None, if never equal"""
+        return None
+
+    def clone(self):
+        """Copy of the item, which can be changed independently"""
+        return copy.copy(self)
+
 class Polygon(Item):
     "Render polygon"
 
+    __slots__ = ('width', 'fill', 'points')
+
     Format = "P %d %d %d %d %s%s"
     Prio = 2
 
@@ -204,9 +227,17 @@ class Polygon(Item):
 
         return True
 
+    def key(self):
+        return ('P',) + tuple(point.key() for point in self.points)
+
     def add(self, point):
         self.points.append(point)
 
+    def clone(self):
+        poly = copy.copy(self)
+        poly.points = list(self.points)
+        return poly
+
     def priority(self):
         return self.unit * 65536 + self.prio * 256 + len(self.points)
 
@@ -219,6 +250,8 @@ class Polygon(Item):
 class Rectangle(Item):
     "Render rectangle"
 
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'width', 'fill')
+
     Format = "S %d %d %d %d %d %d %d %s"
     Prio = 1
 
@@ -239,12 +272,17 @@ class Rectangle(Item):
 
         return self.x1 == rhs.x1 and self.y1 == rhs.y1 and self.x2 == rhs.x2 and self.y2 == rhs.y2
 
+    def key(self):
+        return ('S', self.x1, self.y1, self.x2, self.y2)
+
     def render(self):
         return Rectangle.Format%(self.x1, self.y1, self.x2, self.y2, self.unit, self.representation, self.width, self.fill)
 
 class Circle(Item):
     "Render circle"
 
+    __slots__ = ('x', 'y', 'radius', 'width', 'fill')
+
     Format = "C %d %d %d %d %d %d %s"
     Prio = 3
 
@@ -264,12 +302,17 @@ class Circle(Item):
 
         return self.x == rhs.x and self.y == rhs.y and self.radius == rhs.radius
 
+    def key(self):
+        return ('C', self.x, self.y, self.radius)
+
     def render(self):
         return Circle.Format%(self.x, self.y, self.radius, self.unit, self.representation, self.width, self.fill)
 
 class Arc(Item):
     "Render arc"
 
+    __slots__ = ('x', 'y', 'startX', 'startY', 'endX', 'endY', 'startAngle', 'endAngle', 'radius', 'width', 'fill')
+
     Format = "A %d %d %d %d %d %d %d %d %s %d %d %d %d"
     Prio = 4
 
@@ -295,6 +338,10 @@ class Arc(Item):
 
         return self.x == rhs.x and self.y == rhs.y and self.radius == rhs.radius
 
+    def key(self):
+        # equal() compares against circles, so an arc shares the key of a circle
+        return ('C', self.x, self.y, self.radius)
+
     def render(self):
         return Arc.Format%(self.x, self.y, self.radius, self.startAngle, self.endAngle, self.unit, self.representation, self.width, self.fill, self.startX, self.startY, self.endX, self.endY)
 
@@ -308,6 +355,8 @@ class Text(Item):
         convert - Shape number
     """
 
+    __slots__ = ('x', 'y', 'text', 'size', 'orientation', 'italic', 'bold', 'hjustify', 'vjustify')
+
     Format = 'T %d %d %d %d 0 %d %d %s %s %s %s %s'
     Prio = 0
 
@@ -331,11 +380,16 @@ class Text(Item):
 
         return self.x == rhs.x and self.y == rhs.y and self.text == rhs.text
 
+    def key(self):
+        return ('T', self.x, self.y, self.text)
+
     def render(self):
         return Text.Format%(self.orientation, self.x, self.y, self.size, self.unit, self.representation, self.text, self.italic, self.bold, self.hjustify, self.vjustify)
 
 class Pin_(Item):
 
+    __slots__ = ('x', 'y', 'name', 'number', 'length', 'orientation', 'nameSize', 'numberSize', 'type', 'shape')
+
     Format = "X %s %s %d %d %d %s %d %d %d %d %s %s"
     Prio = 10
 
@@ -402,6 +456,68 @@ class Pin(object):
         """
         return Pin.FormatString %(self.name, self.number, x, y, orientation, group, convert, self.type)
 
+# Parsed symbol templates: filename -> (mtime, rows)
+templateCache = {}
+# Table based symbol layouts: (filename, mtime, unit, section, ...) -> (width, height, modules)
+tableCache = {}
+# Modification times of templates and tables, taken once per build run (see resetStamps)
+fileStamps = {}
+placeholderRe = re.compile(r"\$(\w+)")
+
+def resetStamps():
+    """Forget modification times, so changed templates and tables are parsed again by the next build run"""
+    fileStamps.clear()
+
+def fileStamp(filename):
+    """Modification time of filename, the file is only checked once per build run"""
+    if filename not in fileStamps:
+        fileStamps[filename] = os.path.getmtime(filename)
+    return fileStamps[filename]
+
+def tokenize(text):
+    """Split template text into rows of tokens and convert numeric tokens to int"""
+    rows = []
+    for row in csv.reader(StringIO.StringIO(text), delimiter = " ", skipinitialspace = True):
+        for i in range(len(row)):
+            try:
+                row[i] = int(row[i])
+            except:
+                pass
+        rows.append(row)
+    return rows
+
+def parseTemplate(filename):
+    """Parse a symbol template once per process and file modification.
+        Lines without placeholders are stored tokenized, lines containing
+        $ placeholders are kept as text and tokenized after substitution.
+    """
+    mtime = fileStamp(filename)
+    if filename in templateCache and templateCache[filename][0] == mtime:
+        return templateCache[filename][1]
+
+    file = open(filename, "r")
+    text = re.sub('^#.*$\s*', '', file.read(), 0, re.M)
+    file.close()
+
+    rows = []
+    for line in text.splitlines(True):
+        if placeholderRe.search(line):
+            rows.append(line)
+        else:
+            rows.extend(tokenize(line))
+
+    templateCache[filename] = (mtime, rows)
+    return rows
+
+def templateRows(filename, map):
+    """Yield token rows of template with $ placeholders replaced from map"""
+    for row in parseTemplate(filename):
+        if isinstance(row, list):
+            yield list(row)
+        else:
+            for row in tokenize(placeholderRe.sub(lambda m: map[m.group(1)] if m.group(1) in map else m.group(0), row)):
+                yield row
+
 class Symbol(object):
     """Represents a kicad schematic library symbol."""
 
@@ -469,10 +585,6 @@ class Symbol(object):
         if filename not in self.files:
             self.files.append(filename)
 
-        file = open(filename, "r")
-        text = re.sub('^#.*$\s*', '', file.read(), 0, re.M)
-        file.close()
-
         rep_map = {}
         for key, value in map.iteritems():
             if type(value) is str:
@@ -480,12 +592,9 @@ class Symbol(object):
             else:
                 rep_map[key.upper()] = value
 
-        text = re.sub("\$(\w+)", lambda m: rep_map[m.group(1)] if m.group(1) in rep_map else m.group(0), text)
-        text = StringIO.StringIO(text)
-
         inDef = False
         inDraw = False
-        for row in csv.reader(text, delimiter = " ", skipinitialspace = True):
+        for row in templateRows(filename, rep_map):
             if row[0] == 'EESchema-LIBRARY':
                 if row[2] != '2.3':
                     print "Symbol version %s is not supported yet!"%(row[2])
@@ -500,12 +609,6 @@ class Symbol(object):
             elif row[0] == 'ENDDRAW':
                 inDraw = False
 
-            for i in range(len(row)):
-               try:
-                   row[i] = int(row[i])
-               except:
-                   pass
-
             if inDef and not inDraw:
                 if header:
                     if row[0] == 'DEF':
@@ -601,6 +704,35 @@ class Symbol(object):
         # In table based symbols pin numbers are always visible!
         self.pinnumber = 'Y'
 
+        # Layout only depends on the table and name/reference lengths, so it is computed once and cloned
+        key = (filename, fileStamp(filename), unit, section, len(self.reference), len(self.name), self.offset)
+        if key in tableCache:
+            width, height, modules = tableCache[key]
+            for module in modules:
+                self.addModule(module.clone())
+        else:
+            start = len(self.modules)
+            width, height = self.layoutTable(filename, unit, section)
+            tableCache[key] = (width, height, [module.clone() for module in self.modules[start:]])
+
+        # Fields
+        if centered:
+            self.addField(Field(cfg.REFERENCE_FIELD, self.reference, 0, cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE))
+            self.addField(Field(cfg.NAME_FIELD, self.name, 0, -cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE))
+            self.addField(Field(cfg.FOOTPRINT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 2, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.DOCUMENT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 3, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.MANUFACTURER_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 4, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.VALUE_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 5, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+        else:
+            self.addField(Field(cfg.REFERENCE_FIELD, self.reference, -width, height + cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation = orientation.horizontal, visibility = visibility.visible, hjustify = hjustify.left))
+            self.addField(Field(cfg.NAME_FIELD, self.name, -width, -height - cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation = orientation.horizontal, visibility = visibility.visible, hjustify = hjustify.left))
+            self.addField(Field(cfg.FOOTPRINT_FIELD, '', 0, cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.DOCUMENT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.MANUFACTURER_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 2, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+            self.addField(Field(cfg.VALUE_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 3, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+
+    def layoutTable(self, filename, unit, section):
+        """Add rectangle, pins and decoration of a table based symbol. Returns half width and height of the rectangle"""
         pinsLeft = []
         pinsRight = []
         pinsUp = []
@@ -805,21 +937,7 @@ class Symbol(object):
         if len(section):
             self.addModule(Text(width - self.offset, height - self.offset, section, cfg.SYMBOL_TEXT_SIZE, 0, unit, representation.normal, italic.off, bold.off, hjustify.right, vjustify.top))
 
-        # Fields
-        if centered:
-            self.addField(Field(cfg.REFERENCE_FIELD, self.reference, 0, cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE))
-            self.addField(Field(cfg.NAME_FIELD, self.name, 0, -cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE))
-            self.addField(Field(cfg.FOOTPRINT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 2, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.DOCUMENT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 3, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.MANUFACTURER_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 4, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.VALUE_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 5, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-        else:
-            self.addField(Field(cfg.REFERENCE_FIELD, self.reference, -width, height + cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation = orientation.horizontal, visibility = visibility.visible, hjustify = hjustify.left))
-            self.addField(Field(cfg.NAME_FIELD, self.name, -width, -height - cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation = orientation.horizontal, visibility = visibility.visible, hjustify = hjustify.left))
-            self.addField(Field(cfg.FOOTPRINT_FIELD, '', 0, cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.DOCUMENT_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.MANUFACTURER_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 2, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
-            self.addField(Field(cfg.VALUE_FIELD, '', 0, -cfg.SYMBOL_TEXT_SIZE * 3, cfg.SYMBOL_TEXT_SIZE, orientation.horizontal, visibility.invisible))
+        return (width, height)
 
     def optimize(self):
         """Remove empty fields and detect duplicate graphical elements from symbol and merge them to unit = 0"""
@@ -830,16 +948,26 @@ class Symbol(object):
                 list.append(key)
         self.fields = { key: self.fields[key] for key in self.fields if key not in list }
 
-        start = 0
-        while start < len(self.modules) - 1:
-            base = self.modules[start]
-            start += 1
-            if base.unit < 0:
+        # Group modules by geometry key, so only candidates with equal geometry are compared
+        groups = {}
+        entries = []
+        for module in self.modules:
+            key = module.key()
+            if key is None:
+                entries.append(None)
+            else:
+                group = groups.setdefault(key, [])
+                entries.append((group, len(group)))
+                group.append(module)
+
+        for base, entry in zip(self.modules, entries):
+            if base.unit < 0 or entry is None:
                 continue
 
+            group, position = entry
             list = []
             count = 0
-            for module in itertools.islice(self.modules, start, None):
+            for module in itertools.islice(group, position + 1, None):
                 if module.unit < 0:
                     continue
 
@@ -873,8 +1001,8 @@ class Symbol(object):
                     return False
         return True
 
-    def renderSymbol(self):
-        """Render symbol"""
+    def writeSymbol(self, stream):
+        """Render symbol to stream"""
 
         # Check, if pin name is global visible
         self.pinname = 'N'
@@ -903,22 +1031,23 @@ class Symbol(object):
             if len(self.files) == 1:
                 locked = "F"
 
-        result = [ "#", "# "+self.name, "#", Symbol.Format%(self.name, self.reference, self.offset, self.pinnumber, self.pinname, count, locked, self.flag) ]
+        write = stream.write
+        write("#\n# "+self.name+"\n#\n")
+        write(Symbol.Format%(self.name, self.reference, self.offset, self.pinnumber, self.pinname, count, locked, self.flag)+"\n")
         for key, field in self.fields.iteritems():
-            result.append(field.render())
+            write(field.render()+"\n")
 
         if len(self.alias):
-            result.append("ALIAS "+" ".join(self.alias))
+            write("ALIAS "+" ".join(self.alias)+"\n")
 
-        result.append("DRAW")
+        write("DRAW\n")
         for module in sorted(self.modules, key = lambda x: x.priority()):
-            result.append(module.render())
+            write(module.render()+"\n")
 
-        result.extend(["ENDDRAW", "ENDDEF", ""])
-        return result
+        write("ENDDRAW\nENDDEF\n")
 
-    def renderDescription(self):
-        """Render description for symbol and all aliases"""
+    def writeDescription(self, stream):
+        """Render description for symbol and all aliases to stream"""
 
         data = {}
         if len(self.description):
@@ -930,19 +1059,32 @@ class Symbol(object):
         if len(self.document):
             data['F'] = self.document
 
-        base = []
+        base = ""
         for key, value in data.iteritems():
-            base.append(key+" "+value)
+            base += key+" "+value+"\n"
         if not len(base):
-            return []
+            return
 
-        base.append("$ENDCMP")
-        result = [ "#", "# "+self.name, "#", "$CMP "+self.name] + base
+        base += "$ENDCMP\n"
 
-        for alias in self.alias:
-            result += [ "#", "# "+alias, "#", "$CMP "+alias] + base
-        result.append("")
-        return result
+        write = stream.write
+        for name in [self.name] + self.alias:
+            write("#\n# "+name+"\n#\n$CMP "+name+"\n")
+            write(base)
+
+    def renderSymbol(self):
+        """Render symbol, the result is a list of lines"""
+        buffer = StringIO.StringIO()
+        self.writeSymbol(buffer)
+        return buffer.getvalue().split("\n")
+
+    def renderDescription(self):
+        """Render description for symbol and all aliases, the result is a list of lines"""
+        buffer = StringIO.StringIO()
+        self.writeDescription(buffer)
+        if not buffer.tell():
+            return []
+        return buffer.getvalue().split("\n")
 
     def render(self, packageList = None):
         """Build the symbol representation.